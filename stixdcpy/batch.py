@@ -0,0 +1,253 @@
+#!/usr/bin/python
+"""
+    This module provides tools to run the same reduction over many science data FITS files
+    using a process pool
+
+    Example:
+        from stixdcpy.batch import BatchProcessor
+        bp = BatchProcessor('/data/L1/*pixel*.fits', 'sum_counts',
+                            reduction_kwargs={'start_utc': '2023-05-01T10:00:00',
+                                              'end_utc': '2023-05-01T10:05:00'},
+                            n_jobs=8, output='sum_counts.jsonl')
+        df = bp.run()
+"""
+import glob
+import json
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from stixdcpy.logger import logger
+from stixdcpy import science
+
+REDUCTIONS = {
+    'sum_counts':
+    lambda sci, **kwargs: sci.get_sum_counts(**kwargs),
+    'spectrum':
+    lambda sci, **kwargs: {
+        'spectrum': sci.spectrum
+    },
+}
+# built-in reductions, they are referred to by name so that they can be sent to workers
+
+
+def _to_json(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def _from_json(row):
+    return {
+        key: np.array(val) if isinstance(val, list) else val
+        for key, val in row.items()
+    }
+
+
+def process_file(fname, reduction, data_type='PixelData',
+                 reduction_kwargs=None, load_kwargs=None):
+    """
+        Load a science data file and apply a reduction to it
+    Args
+        fname: str
+            FITS filename
+        reduction: str or callable
+            name of a built-in reduction (see REDUCTIONS) or a picklable function
+            which takes a science data object and returns a dict
+        data_type: str
+            PixelData or Spectrogram
+        reduction_kwargs: dict
+            keyword arguments of the reduction
+        load_kwargs: dict
+            keyword arguments passed to the science data class
+    Returns
+        row: dict
+            reduction result, with filename, status and error message
+    """
+    row = {'filename': str(fname), 'status': 'ok', 'error': None}
+    func = REDUCTIONS[reduction] if isinstance(reduction, str) else reduction
+    cls = getattr(science, data_type)
+    try:
+        with cls(str(fname), None, **(load_kwargs or {})) as sci:
+            result = func(sci, **(reduction_kwargs or {}))
+            row['T0_utc'] = sci.T0_utc
+            row['duration'] = float(sci.duration)
+        if result is None:
+            result = {}
+        elif not isinstance(result, dict):
+            result = {'result': result}
+        row.update(result)
+    except Exception as e:
+        logger.warning(f'Failed to process {fname}: {e}')
+        row['status'] = 'error'
+        row['error'] = f'{type(e).__name__}: {e}'
+    return row
+
+
+def _process_chunk(fnames, reduction, data_type, reduction_kwargs,
+                   load_kwargs):
+    return [
+        process_file(fname, reduction, data_type, reduction_kwargs,
+                     load_kwargs) for fname in fnames
+    ]
+
+
+class BatchProcessor(object):
+    """
+        Apply the same reduction to many science data files in a process pool
+    """
+
+    def __init__(self,
+                 files,
+                 reduction,
+                 data_type='PixelData',
+                 reduction_kwargs=None,
+                 load_kwargs=None,
+                 n_jobs=1,
+                 chunk_size=8,
+                 output=None):
+        """
+        Args
+            files: str or list
+                list of FITS filenames or a glob pattern
+            reduction: str or callable
+                name of a built-in reduction (see REDUCTIONS) or a picklable (module level) function
+                which takes a PixelData or Spectrogram object and returns a dict
+            data_type: str
+                PixelData or Spectrogram
+            reduction_kwargs: dict
+                keyword arguments of the reduction
+            load_kwargs: dict
+                keyword arguments passed to the science data class, e.g., {'ltc': True}
+            n_jobs: int
+                number of worker processes. Files are processed in the current process if n_jobs is 1
+            chunk_size: int
+                number of files sent to a worker at a time
+            output: str or None
+                JSON lines file the results are streamed to. Files found in it with status "ok" and
+                the same configuration (reduction, data type and keyword arguments) are skipped,
+                so that an interrupted run can be resumed
+        """
+        if isinstance(files, (str, Path)):
+            files = sorted(glob.glob(str(files)))
+        self.files = [str(f) for f in files]
+        if isinstance(reduction, str) and reduction not in REDUCTIONS:
+            raise ValueError(
+                f'Unknown reduction {reduction}, available: {list(REDUCTIONS)}')
+        self.reduction = reduction
+        self.data_type = data_type
+        self.reduction_kwargs = reduction_kwargs or {}
+        self.load_kwargs = load_kwargs or {}
+        self.n_jobs = n_jobs
+        self.chunk_size = max(1, int(chunk_size))
+        self.output = output
+
+    @property
+    def reduction_name(self):
+        if isinstance(self.reduction, str):
+            return self.reduction
+        return f'{self.reduction.__module__}.{self.reduction.__qualname__}'
+
+    @property
+    def config_hash(self):
+        """
+            hash of the configuration the results depend on, written to each row of the output file
+        """
+        text = json.dumps(
+            {
+                'reduction': self.reduction_name,
+                'data_type': self.data_type,
+                'reduction_kwargs': self.reduction_kwargs,
+                'load_kwargs': self.load_kwargs
+            },
+            sort_keys=True,
+            default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def read_output(self, all_configs=False):
+        """
+            read the results already written to the output file
+        Args
+            all_configs: bool
+                also return rows written with a different configuration
+        Returns
+            rows: list of dict
+        """
+        if not self.output or not Path(self.output).is_file():
+            return []
+        rows = []
+        with open(self.output) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(_from_json(json.loads(line)))
+        if not all_configs:
+            config = self.config_hash
+            rows = [row for row in rows if row.get('config') == config]
+        return rows
+
+    def iter_results(self):
+        """
+            Process the files and yield the result of each file as soon as its chunk is done.
+        Yields
+            row: dict
+        """
+        done = {
+            row['filename']
+            for row in self.read_output() if row.get('status') == 'ok'
+        }
+        todo = [f for f in self.files if f not in done]
+        if done:
+            logger.info(
+                f'{len(self.files) - len(todo)} files already processed, {len(todo)} to go')
+        chunks = [
+            todo[i:i + self.chunk_size]
+            for i in range(0, len(todo), self.chunk_size)
+        ]
+        args = (self.reduction, self.data_type, self.reduction_kwargs,
+                self.load_kwargs)
+        out = open(self.output, 'a') if self.output else None
+        try:
+            if self.n_jobs == 1:
+                results = (_process_chunk(chunk, *args) for chunk in chunks)
+                for rows in results:
+                    yield from self._write(rows, out)
+            else:
+                with ProcessPoolExecutor(max_workers=self.n_jobs) as executor:
+                    futures = [
+                        executor.submit(_process_chunk, chunk, *args)
+                        for chunk in chunks
+                    ]
+                    for future in as_completed(futures):
+                        yield from self._write(future.result(), out)
+        finally:
+            if out:
+                out.close()
+
+    def _write(self, rows, out):
+        for row in rows:
+            row['reduction'] = self.reduction_name
+            row['config'] = self.config_hash
+            if out:
+                out.write(json.dumps(row, default=_to_json) + '\n')
+                out.flush()
+            yield row
+
+    def run(self):
+        """
+            Process all files
+        Returns
+            df: pandas.DataFrame
+                one row per file, including the results found in the output file
+        """
+        new_rows = list(self.iter_results())
+        if self.output:
+            rows = {row['filename']: row for row in self.read_output()}
+            rows.update({row['filename']: row for row in new_rows})
+            new_rows = [rows[f] for f in self.files if f in rows]
+        return pd.DataFrame(new_rows)
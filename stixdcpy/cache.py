@@ -0,0 +1,216 @@
+#!/usr/bin/python
+"""
+    Opt-in, content-addressed disk cache for derived science data products.
+
+    Results are keyed by the checksum of the input FITS file, the function name, its parameters,
+    the data selection and the stixdcpy version, and are stored in the array store format.
+    The least recently used results are removed when the cache exceeds its disk quota.
+
+    Example:
+        from stixdcpy import cache
+        cache.enable('/data/stixdcpy_cache', max_bytes=20e9)
+        pd = PixelData(fname, None)
+        pd.correct_dead_time()  # computed and cached
+        pd.correct_dead_time()  # loaded from the cache
+"""
+import os
+import json
+import shutil
+import hashlib
+import datetime
+from pathlib import Path
+
+import numpy as np
+
+from stixdcpy.logger import logger
+from stixdcpy import store as sst
+
+try:
+    from importlib.metadata import version
+    VERSION = version('stixdcpy')
+except Exception:
+    VERSION = 'unknown'
+
+DEFAULT_CACHE_PATH = Path.home() / '.stixdcpy' / 'cache'
+DEFAULT_MAX_BYTES = 10e9
+
+_cache = None
+
+
+class ResultCache(object):
+    """
+        Disk cache of dicts of numpy arrays with LRU eviction
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args
+            path: str
+                cache folder
+            max_bytes: float
+                disk quota in bytes
+        """
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(checksum, func_name, params):
+        text = json.dumps(
+            {
+                'checksum': checksum,
+                'function': func_name,
+                'params': params,
+                'version': VERSION
+            },
+            sort_keys=True,
+            default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+            get a cached result
+        Returns
+            result: dict or None if not found
+        """
+        entry = self.path / key
+        try:
+            arrays = sst.ArrayStore(entry)
+        except (OSError, ValueError):
+            return None
+        result = dict(arrays.meta.get('values', {}))
+        datetime_lists = arrays.meta.get('datetime_lists', [])
+        for name in arrays.names:
+            arr = arrays.read(name, mmap=False)
+            result[name] = arr.astype(
+                'datetime64[us]').tolist() if name in datetime_lists else arr
+        # mark as recently used
+        os.utime(entry / sst.META_FILE)
+        return result
+
+    def put(self, key, result):
+        """
+            Cache a result. Numpy arrays and lists of datetimes are stored as arrays,
+            JSON serializable values as metadata; other values are not cached
+        """
+        arrays, values, datetime_lists = {}, {}, []
+        for name, val in result.items():
+            if isinstance(val, np.ndarray):
+                arrays[name] = val
+            elif isinstance(val, list) and val and isinstance(
+                    val[0], datetime.datetime):
+                arrays[name] = np.array(val, dtype='datetime64[us]')
+                datetime_lists.append(name)
+            elif isinstance(val, (str, int, float, bool, type(None))):
+                values[name] = val
+            elif isinstance(val, np.generic):
+                values[name] = val.item()
+        sst.ArrayStore.write(self.path / key,
+                             arrays, {
+                                 'values': values,
+                                 'datetime_lists': datetime_lists
+                             },
+                             overwrite=True)
+        self.evict()
+
+    def entries(self):
+        """
+            cached entries, least recently used first
+        Returns
+            list of (last access time, size in bytes, path)
+        """
+        items = []
+        for entry in self.path.iterdir():
+            meta = entry / sst.META_FILE
+            if not meta.is_file():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            items.append((meta.stat().st_mtime, size, entry))
+        return sorted(items)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+            remove least recently used entries until the cache fits in its quota
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for _, _, entry in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def enable(path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    """
+        Enable caching of derived products
+    Returns
+        ResultCache
+    """
+    global _cache
+    _cache = ResultCache(path, max_bytes)
+    return _cache
+
+
+def disable():
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    return _cache
+
+
+def _selection(sci):
+    selection = {
+        'data_type': sci.data_type,
+        'row_range': sci._row_range,
+        'time_bin_shifted': sci._time_bin_shifted,
+        'light_time_corrected': sci.light_time_corrected,
+    }
+    if getattr(sci, 'compact', False):
+        selection['compact'] = True
+    return selection
+
+
+def lookup(sci, func_name, **params):
+    """
+        Look up a derived product of a science data object
+    Args
+        sci: ScienceData
+        func_name: str
+            name of the function computing the product
+        params:
+            parameters the result depends on
+    Returns
+        result: dict or None if caching is disabled or the result was not found
+    """
+    if _cache is None:
+        return None
+    key = _cache.make_key(sci.checksum, func_name,
+                          dict(params, **_selection(sci)))
+    result = _cache.get(key)
+    if result is not None:
+        logger.info(f'Loaded {func_name} result of {sci.fname} from cache')
+    return result
+
+
+def store(sci, func_name, result, **params):
+    """
+        Store a derived product of a science data object if caching is enabled
+    """
+    if _cache is None:
+        return
+    key = _cache.make_key(sci.checksum, func_name,
+                          dict(params, **_selection(sci)))
+    try:
+        _cache.put(key, result)
+    except OSError as e:
+        logger.warning(f'Failed to cache {func_name} result: {e}')
@@ -0,0 +1,317 @@
+#!/usr/bin/python
+"""
+    Virtual datasets presenting several science data files as one time-ordered object.
+
+    Count cubes are not concatenated; they are indexed lazily through the memory-mapped FITS files,
+    so that only the time bins which are accessed are read.
+
+    Example:
+        from stixdcpy.dataset import PixelDataset
+        with PixelDataset(['request_1.fits', 'request_2.fits']) as pd:
+            sums = pd.get_sum_counts('2023-05-01T10:00:00', '2023-05-01T10:30:00')
+            spectrum = pd.spectrum
+"""
+import hashlib
+from functools import cached_property
+
+import numpy as np
+
+from stixdcpy.logger import logger
+from stixdcpy import time_util as sdt
+from stixdcpy.science import PixelData
+
+# time bins of later files starting this much before the end of the previous file are dropped
+OVERLAP_TOLERANCE = 1e-3
+
+
+class VirtualCube(object):
+    """
+        Read-only concatenation of arrays along the first (time) axis without copying.
+        Indexing reads only the parts needed; sums are computed part by part.
+        Other numpy operations convert it to a (concatenated) numpy array
+    """
+
+    def __init__(self, parts):
+        """
+        Args
+            parts: list
+                arrays with the same shape except for the first axis, e.g., memory-mapped FITS columns
+        """
+        self.parts = parts
+        self.offsets = np.cumsum([0] + [len(p) for p in parts])
+        self.shape = (int(self.offsets[-1]), ) + tuple(parts[0].shape[1:])
+        self.dtype = np.result_type(*[p.dtype for p in parts])
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        arr = np.concatenate([np.asarray(p) for p in self.parts])
+        return arr if dtype is None else arr.astype(dtype, copy=False)
+
+    def astype(self, dtype, copy=True):
+        return np.asarray(self, dtype=dtype)
+
+    def _time_index(self, key):
+        """
+            key as a tuple whose first element indexes the time axis, or None if it can not be split
+            this way, e.g., with np.newaxis or multi-dimensional masks
+        """
+        key = key if isinstance(key, tuple) else (key, )
+        ellipses = [k for k, i in enumerate(key) if i is Ellipsis]
+        if any(i is None for i in key) or len(ellipses) > 1:
+            return None
+        if ellipses:
+            pos = ellipses[0]
+            key = key[:pos] + (slice(None), ) * (self.ndim - len(key) +
+                                                 1) + key[pos + 1:]
+        if not key:
+            return (slice(None), )
+        first = key[0]
+        if not isinstance(first, (slice, int, np.integer)) and np.ndim(first) != 1:
+            return None
+        return key
+
+    def __getitem__(self, key):
+        index = self._time_index(key)
+        if index is None:
+            return np.asarray(self)[key]
+        first, rest = index[0], index[1:]
+        if isinstance(first, (int, np.integer)):
+            i = int(first) + len(self) if first < 0 else int(first)
+            if not 0 <= i < len(self):
+                raise IndexError(f'index {first} is out of bounds for axis 0 with size {len(self)}')
+            k = int(np.searchsorted(self.offsets, i, side='right')) - 1
+            return self.parts[k][(i - self.offsets[k], ) + rest]
+        if isinstance(first, slice) and first.step in (None, 1):
+            start, stop, _ = first.indices(len(self))
+            pieces = [
+                part[(slice(max(start, lo) - lo, min(stop, hi) - lo), ) + rest]
+                for part, lo, hi in zip(self.parts, self.offsets[:-1],
+                                        self.offsets[1:])
+                if max(start, lo) < min(stop, hi)
+            ]
+            if not pieces:
+                return np.asarray(self.parts[0][(slice(0, 0), ) + rest])
+            return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+        # strided slices, index arrays and boolean masks
+        idx = np.arange(len(self))[first]
+        part_of = np.searchsorted(self.offsets, idx, side='right') - 1
+        pieces = {
+            k: np.asarray(self.parts[k][(idx[part_of == k] - self.offsets[k], ) +
+                                        rest])
+            for k in np.unique(part_of)
+        }
+        if not pieces:
+            return np.asarray(self.parts[0][(idx, ) + rest])
+        shape = next(iter(pieces.values())).shape[1:]
+        out = np.empty((len(idx), ) + shape, dtype=self.dtype)
+        for k, piece in pieces.items():
+            out[part_of == k] = piece
+        return out
+
+    def sum(self, axis=None, dtype=None, out=None, **kwargs):
+        """
+            sum computed part by part, same as numpy.sum
+        """
+        axes = tuple(range(self.ndim)) if axis is None else tuple(
+            a % self.ndim for a in np.atleast_1d(axis))
+        sums = [np.sum(p, axis=axes, dtype=dtype, **kwargs) for p in self.parts]
+        result = np.sum(sums, axis=0) if 0 in axes else np.concatenate(sums)
+        if out is not None:
+            out[...] = result
+            return out
+        return result
+
+    def __repr__(self):
+        return f'VirtualCube(shape={self.shape}, dtype={self.dtype}, parts={len(self.parts)})'
+
+
+class PixelDataset(PixelData):
+    """
+        Several pixel data files, e.g., the bulk science data requests of a flare, presented as one
+        time-ordered PixelData object without copying the count cubes.
+        Configurations (energy bins, detector and pixel masks) are checked when loading;
+        time bins of a file overlapping with the previous file are dropped.
+        The reductions of PixelData (spectra, get_sum_counts, correct_dead_time, sum_regions, iter_chunks, etc.)
+        work across file boundaries
+    """
+
+    def __init__(self, fnames, ltc=False, **kwargs):
+        """
+        Arguments:
+        fnames: list
+            FITS filenames
+        ltc: bool
+            light time correction
+        kwargs:
+            loading options passed to PixelData of each file, i.e., memmap, columns, start_utc, end_utc
+            and error_dtype
+        """
+        if not fnames:
+            raise ValueError('No FITS files given')
+        self.fnames = tuple(str(f) for f in fnames)
+        self.load_kwargs = kwargs
+        self._load(ltc)
+
+    def _load(self, ltc):
+        parts = [PixelData(f, None, ltc=ltc, **self.load_kwargs) for f in self.fnames]
+        parts.sort(key=lambda p: p.T0_unix + p.time[0] - 0.5 * p.timedel[0])
+        self._check_consistency(parts)
+
+        # drop time bins overlapping with the previous file
+        part_rows = []
+        prev_end = -np.inf
+        for part in parts:
+            starts = part.T0_unix + part.time - 0.5 * part.timedel
+            first = int(np.searchsorted(starts, prev_end - OVERLAP_TOLERANCE))
+            if first > 0:
+                logger.info(f'{first} time bins of {part.fname} overlap with the previous file')
+            part_rows.append((first, len(part.time)))
+            if first < len(part.time):
+                prev_end = starts[-1] + part.timedel[-1]
+
+        ref = parts[0]
+        self.__dict__.update({
+            key: val
+            for key, val in ref.__dict__.items()
+            if key not in self._cached_property_names()
+        })
+        self.parts = parts
+        self.part_rows = part_rows
+        self.fname = ref.fname
+        self.request_id = [
+            rid for part in parts
+            for rid in np.atleast_1d(part.request_id).tolist()
+        ]
+        self.error_sources = {}
+        self.corrected = None
+        self.pixel_counts_comp_stat_err = None
+        self.comp_skm = None
+        self._row_range = (0, None)
+        self._time_bin_shifted = False
+        self._shared = {}
+
+        def concat(name):
+            if getattr(ref, name) is None:
+                return None
+            return np.concatenate([
+                np.asarray(getattr(p, name)[first:last])
+                for p, (first, last) in zip(parts, part_rows)
+            ])
+
+        self.timedel = concat('timedel')
+        self.time = np.concatenate([
+            p.time[first:last] + (p.T0_unix - ref.T0_unix)
+            for p, (first, last) in zip(parts, part_rows)
+        ])
+        self.triggers = concat('triggers')
+        self.rcr = concat('rcr')
+        self.unix_time = concat('unix_time')
+        self.datetime64 = sdt.unix2datetime64(self.unix_time)
+        self._datetime = None
+        self.counts = None if ref.counts is None else VirtualCube([
+            p.counts[first:last] for p, (first, last) in zip(parts, part_rows)
+        ])
+        self.pixel_counts = self.counts
+        self.duration = self.time[-1] - self.time[0] + (self.timedel[0] +
+                                                        self.timedel[-1]) / 2
+        self.invalidate()
+
+    @staticmethod
+    def _check_consistency(parts):
+        ref = parts[0]
+        for part in parts[1:]:
+            if not np.array_equal(ref.energy_bin_mask, part.energy_bin_mask):
+                raise ValueError(
+                    f'Energy bin masks of {ref.fname} and {part.fname} are different!')
+            for name in ('e_low', 'e_high'):
+                if not np.allclose(ref.energies[name], part.energies[name]):
+                    raise ValueError(
+                        f'Energy bins of {ref.fname} and {part.fname} are different!')
+            control = part.hdul['CONTROL'].data
+            for name in ('pixel_masks', 'detector_masks', 'pixel_mask',
+                         'detector_mask'):
+                if name in ref.hdul['CONTROL'].data.names and not np.array_equal(
+                        ref.hdul['CONTROL'].data[name], control[name]):
+                    raise ValueError(
+                        f'Values for {name} in control table are different in {ref.fname} and {part.fname}!'
+                    )
+
+    @cached_property
+    def checksum(self):
+        text = ';'.join(f'{p.checksum}:{first}:{last}'
+                        for p, (first, last) in zip(self.parts, self.part_rows))
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    @cached_property
+    def spectrogram(self):
+        return np.concatenate([
+            p.spectrogram[first:last]
+            for p, (first, last) in zip(self.parts, self.part_rows)
+        ])
+
+    def read_column(self, name, shifted=True, rows=None):
+        """
+            Read a column of the DATA tables of all files
+        Args
+            name: str
+                column name
+            shifted: bool
+                apply the time bin shift correction to the column
+            rows: tuple or None
+                (start, stop) row range of the dataset
+        Returns
+            column: np.ndarray
+        """
+        start, stop = (0, len(self.time)) if rows is None else rows
+        pieces = []
+        offset = 0
+        for part, (first, last) in zip(self.parts, self.part_rows):
+            lo, hi = max(start, offset), min(stop, offset + last - first)
+            if lo < hi:
+                pieces.append(
+                    part.read_column(name,
+                                     shifted,
+                                     rows=(first + lo - offset,
+                                           first + hi - offset)))
+            offset += last - first
+        if not pieces:
+            return self.parts[0].read_column(name, shifted, rows=(0, 0))
+        return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+    def read_fits(self, light_time_correction=True):
+        self._load(light_time_correction)
+
+    def close(self):
+        for part in self.__dict__.get('parts', []):
+            part.close()
+        # the HDU list is shared with the first file
+        self._closed = '_hdul' in self.__dict__
+
+    def __getstate__(self):
+        """
+            Only the filenames and loading options are pickled, files are opened again on first data access
+        """
+        return {
+            '_detached': True,
+            '_shared': {},
+            'fnames': self.fnames,
+            'load_kwargs': self.load_kwargs,
+            'light_time_corrected': self.light_time_corrected
+        }
+
+    def reopen(self):
+        self.__dict__.pop('_detached', None)
+        self._load(self.light_time_corrected)
+
+    def __repr__(self):
+        return f'PixelDataset({list(self.fnames)}, time_bins={len(self.time)})'
@@ -0,0 +1,231 @@
+#!/usr/bin/python
+"""
+    Streaming flare detection over QL light curves.
+
+    Light curves are consumed tile by tile, e.g., as they are fetched from STIX data center.
+    The background level and its deviation are exponentially weighted running estimates, kept in O(1) state and
+    updated once per block of time bins with vectorized weights; samples inside flares do not update them.
+    A flare starts when the counts of the detection energy band exceed background + threshold x sigma and ends
+    when they fall below background + end_threshold x sigma.
+
+    Example:
+        from stixdcpy.quicklook import LightCurves
+        from stixdcpy.flares import detect_flares
+        tiles = LightCurves.iter_from_sdc('2023-05-01T00:00:00', '2023-06-01T00:00:00')
+        flares = detect_flares(tiles)
+"""
+import numpy as np
+import pandas as pd
+
+from stixdcpy import time_util as sdt
+
+MAD_TO_SIGMA = np.sqrt(np.pi / 2)
+# ratio of the standard deviation to the mean absolute deviation of a normal distribution
+
+
+class FlareDetector(object):
+    """
+        Incremental flare detector. Feed it light curve tiles in time order with update() or process(),
+        and call flush() at the end of the data
+    """
+
+    def __init__(self,
+                 band=0,
+                 threshold=5.,
+                 end_threshold=2.,
+                 time_constant=3600.,
+                 min_samples=3,
+                 block_size=256):
+        """
+        Args
+            band: int
+                index of the energy band used for detection, 0 is 4 - 10 keV for QL light curves
+            threshold: float
+                a flare starts when counts exceed background + threshold x sigma
+            end_threshold: float
+                a flare ends when counts fall below background + end_threshold x sigma, lower than threshold
+            time_constant: float
+                time constant of the background estimators in units of seconds
+            min_samples: int
+                minimum number of time bins of a flare, shorter intervals are discarded
+            block_size: int
+                number of time bins processed with the same background estimate
+        """
+        if not end_threshold < threshold:
+            raise ValueError(
+                f'end_threshold ({end_threshold}) must be lower than threshold ({threshold})')
+        self.band = band
+        self.threshold = threshold
+        self.end_threshold = end_threshold
+        self.time_constant = time_constant
+        self.min_samples = min_samples
+        self.block_size = block_size
+        self.background = None
+        self.deviation = None
+        self._flare = None
+        self._last_time = None
+
+    @property
+    def sigma(self):
+        """ noise of the detection band, not lower than the Poisson noise of the background """
+        return max(self.deviation * MAD_TO_SIGMA,
+                   np.sqrt(max(self.background, 1.)))
+
+    @property
+    def in_flare(self):
+        return self._flare is not None
+
+    def process(self, lc, dead_time_correction=False):
+        """
+            Process a light curve tile
+        Args
+            lc: stixdcpy.quicklook.LightCurves
+            dead_time_correction: bool
+                use dead time corrected counts
+        Returns
+            flares: list of dict
+                flares which ended in this tile
+        """
+        if not len(lc.unix_time):
+            return []
+        counts = lc.counts
+        if dead_time_correction:
+            corrected = lc.corrected if lc.corrected is not None else lc.correct_dead_time()
+            counts = corrected['corrected_counts']
+        return self.update(lc.unix_time, counts)
+
+    def update(self, unix_time, counts):
+        """
+            Process new time bins
+        Args
+            unix_time: array-like
+                time of the time bins, later than the time bins processed before
+            counts: array-like
+                counts, energy bands x time bins
+        Returns
+            flares: list of dict
+                flares which ended in these time bins
+        """
+        unix_time = np.asarray(unix_time, dtype=np.float64)
+        counts = np.atleast_2d(np.asarray(counts, dtype=np.float64))
+        if self._last_time is not None:
+            new = unix_time > self._last_time
+            unix_time, counts = unix_time[new], counts[:, new]
+        flares = []
+        for i in range(0, len(unix_time), self.block_size):
+            j = i + self.block_size
+            flares.extend(self._process_block(unix_time[i:j], counts[:, i:j]))
+        return flares
+
+    def _process_block(self, time, counts):
+        x = counts[self.band]
+        if self.background is None:
+            self.background = float(np.median(x))
+            self.deviation = float(np.mean(np.abs(x - self.background)))
+        sigma = self.sigma
+        above = x > self.background + self.threshold * sigma
+        below = x < self.background + self.end_threshold * sigma
+
+        flares = []
+        in_flare = np.zeros(len(x), dtype=bool)
+        i = 0
+        while i < len(x):
+            if self._flare is None:
+                starts = np.flatnonzero(above[i:])
+                if not starts.size:
+                    break
+                i += starts[0]
+                self._start_flare(time[i], counts.shape[0])
+            ends = np.flatnonzero(below[i:])
+            j = i + ends[0] if ends.size else len(x)
+            self._add_to_flare(time[i:j], counts[:, i:j])
+            in_flare[i:j] = True
+            if ends.size:
+                flare = self._end_flare(time[j])
+                if flare is not None:
+                    flares.append(flare)
+            i = j
+        self._update_background(time, x, in_flare)
+        self._last_time = time[-1]
+        return flares
+
+    def _update_background(self, time, x, in_flare):
+        dt = np.median(np.diff(time)) if len(time) > 1 else 4.
+        alpha = 1 - np.exp(-dt / self.time_constant)
+        num = len(x)
+        # weight of each sample after num exponentially weighted updates
+        weights = alpha * (1 - alpha)**np.arange(num - 1, -1, -1)
+        decay = (1 - alpha)**num
+        values = np.where(in_flare, self.background, x)
+        deviations = np.where(in_flare, self.deviation,
+                              np.abs(x - self.background))
+        self.background = float(decay * self.background + weights @ values)
+        self.deviation = float(decay * self.deviation + weights @ deviations)
+
+    def _start_flare(self, start_time, num_bands):
+        self._flare = {
+            'start_unix': start_time,
+            'end_unix': start_time,
+            'peak_unix': start_time,
+            'peak_counts': np.full(num_bands, -np.inf),
+            'total_counts': np.zeros(num_bands),
+            'background': self.background,
+            'sigma': self.sigma,
+            'num_samples': 0,
+        }
+
+    def _add_to_flare(self, time, counts):
+        if not len(time):
+            return
+        flare = self._flare
+        peak = int(np.argmax(counts[self.band]))
+        if counts[self.band, peak] > flare['peak_counts'][self.band]:
+            flare['peak_unix'] = time[peak]
+        flare['peak_counts'] = np.maximum(flare['peak_counts'],
+                                          counts.max(axis=1))
+        flare['total_counts'] += counts.sum(axis=1)
+        flare['num_samples'] += len(time)
+        flare['end_unix'] = time[-1]
+
+    def _end_flare(self, end_time):
+        flare, self._flare = self._flare, None
+        flare['end_unix'] = end_time
+        if flare['num_samples'] < self.min_samples:
+            return None
+        flare['duration'] = flare['end_unix'] - flare['start_unix']
+        for key in ('start', 'end', 'peak'):
+            flare[f'{key}_utc'] = sdt.unix2utc(flare[f'{key}_unix'])
+        return flare
+
+    def flush(self):
+        """
+            End the ongoing flare at the end of the data
+        Returns
+            flares: list of dict
+        """
+        if self._flare is None:
+            return []
+        flare = self._end_flare(self._flare['end_unix'])
+        return [] if flare is None else [flare]
+
+
+def detect_flares(lcs, dead_time_correction=False, **kwargs):
+    """
+        Detect flares in a sequence of light curve tiles
+    Args
+        lcs: iterable
+            LightCurves objects in time order, e.g., from LightCurves.iter_from_sdc
+        dead_time_correction: bool
+            use dead time corrected counts
+        kwargs:
+            FlareDetector parameters
+    Returns
+        flares: pandas.DataFrame
+            one row per flare, with start, end and peak times, and peak and total counts per energy band
+    """
+    detector = FlareDetector(**kwargs)
+    flares = []
+    for lc in lcs:
+        flares.extend(detector.process(lc, dead_time_correction))
+    flares.extend(detector.flush())
+    return pd.DataFrame(flares)
@@ -23,14 +23,23 @@ class Compression(object):
     def __init__(self,s, k,m, include_stat_error=True):
         self.skm=(s,k,m)
         self.lut=Compression.get_error_lut(s,k,m, include_stat_error)
+        self.lut_values = np.array(sorted(self.lut))
+        self.lut_errors = np.array([self.lut[v] for v in self.lut_values],
+                                   dtype=np.float64)
 
     def get_errors(self,counts:np.array):
         """
-            calculate errors for counts
+            calculate errors for counts, using a vectorized look-up of the error table
         """
-        fv=np.vectorize(self.get_error, otypes=[np.float])
-        #otypes must be specified
-        return fv(counts)
+        counts = np.asarray(counts)
+        index = np.clip(np.searchsorted(self.lut_values, counts), 0,
+                        self.lut_values.size - 1)
+        found = (self.lut_values[index] == counts) | (counts == 0)
+        if not np.all(found):
+            s,k,m=self.skm
+            missing = counts[~found].flat[0]
+            raise Exception(f'Failed to error of {missing}! Could the compression scheme ({s=},{k=},{m=}) wrong?')
+        return np.where(counts == 0, 0., self.lut_errors[index])
         
 
 
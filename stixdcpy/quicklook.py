@@ -9,10 +9,18 @@ from datetime import datetime
 import numpy as np
 from matplotlib import pyplot as plt
 from stixdcpy import io as sio
+from stixdcpy import reduction
+from stixdcpy import time_util as sdt
 from stixdcpy.net import Request as jreq
+from stixdcpy.science import BETA, ASIC_TAU, TRIG_TAU
 import matplotlib.dates as mdates
 import pandas as pd
 
+QL_TIME_BIN = 4
+# integration time of QL light curves in seconds
+NUM_TRIGGER_GROUPS = 16
+# QL triggers are summed over the 16 trigger accumulators
+
 
 class QuickLook(sio.IO):
     def __init__(self):
@@ -31,9 +39,13 @@ class LightCurves(QuickLook):
         self.dlt = 0
         self.rcr = []
         self.triggers = []
+        self.unix_time = np.array([])
+        self.corrected = None
         if data is not None:
             if 'error' not in data and 'counts' in data:
                 self.counts = np.array(data['counts'])
+                self.unix_time = data['start_unix'] + np.asarray(
+                    data['delta_time'], dtype=np.float64)
                 self.time = [datetime.utcfromtimestamp(
                     t + data['start_unix']) for t in data['delta_time']]
                 self.triggers = np.array(data['triggers'])
@@ -63,6 +75,125 @@ class LightCurves(QuickLook):
         data = jreq.fetch_light_curves(start_utc, end_utc, ltc)
         return cls(data)
 
+    @classmethod
+    def iter_from_sdc(cls, start_utc, end_utc, ltc=False, tile=86400):
+        """ fetch light curves of a long time range from STIX data center, one tile at a time
+
+        Args:
+            start_utc: str or datetime
+                data start UTC
+            end_utc: str or datetime
+                data end UTC
+            ltc: bool
+                Light time correction flag
+            tile: float
+                length of the tiles in units of seconds, one day by default
+        Yields:
+            lc: LightCurves
+                light curves of a tile
+        """
+        start, end = sdt.utc2unix(start_utc), sdt.utc2unix(end_utc)
+        for tile_start in np.arange(start, end, tile):
+            tile_end = min(tile_start + tile, end)
+            yield cls.from_sdc(sdt.unix2utc(tile_start),
+                               sdt.unix2utc(tile_end), ltc)
+
+    @classmethod
+    def from_sdc_tiled(cls,
+                       start_utc,
+                       end_utc,
+                       ltc=False,
+                       tile=86400,
+                       dead_time_correction=False):
+        """ fetch light curves of a long time range from STIX data center tile by tile, and concatenate them
+
+        Args:
+            start_utc: str or datetime
+                data start UTC
+            end_utc: str or datetime
+                data end UTC
+            ltc: bool
+                Light time correction flag
+            tile: float
+                length of the tiles in units of seconds, one day by default
+            dead_time_correction: bool
+                correct each tile for dead time as soon as it is fetched
+        Returns:
+            lc: LightCurves
+        """
+        tiles = []
+        for lc in cls.iter_from_sdc(start_utc, end_utc, ltc, tile):
+            if dead_time_correction and len(lc.unix_time):
+                lc.correct_dead_time()
+            tiles.append(lc)
+        return cls.concatenate(tiles)
+
+    @classmethod
+    def concatenate(cls, lcs):
+        """ concatenate time-ordered light curves, e.g., tiles of a long time range.
+            Time bins already covered by a previous light curve are dropped
+
+        Args:
+            lcs: list
+                LightCurves objects
+        Returns:
+            lc: LightCurves
+        """
+        lcs = [lc for lc in lcs if len(lc.unix_time)]
+        if not lcs:
+            return cls(None)
+        keep = []
+        last = -np.inf
+        for lc in lcs:
+            keep.append(lc.unix_time > last)
+            last = max(last, lc.unix_time[-1])
+        first = lcs[0].data
+        start_unix = first['start_unix']
+        data = dict(first)
+        data.update({
+            'counts':
+            np.concatenate([lc.counts[:, k] for lc, k in zip(lcs, keep)],
+                           axis=1),
+            'delta_time':
+            np.concatenate([lc.unix_time[k] for lc, k in zip(lcs, keep)]) -
+            start_unix,
+            'triggers':
+            np.concatenate([lc.triggers[k] for lc, k in zip(lcs, keep)]),
+            'rcr':
+            np.concatenate([lc.rcr[k] for lc, k in zip(lcs, keep)]),
+        })
+        lc = cls(data)
+        if all(l.corrected is not None for l in lcs):
+            lc.corrected = {
+                key: np.concatenate(
+                    [l.corrected[key][..., k] for l, k in zip(lcs, keep)],
+                    axis=-1)
+                for key in lcs[0].corrected
+            }
+        return lc
+
+    @property
+    def timedel(self):
+        """ integration time of the time bins, derived from the time stamps. It is at most the nominal
+            QL time bin, so that data gaps do not extend the time bins before them """
+        timedel = np.full(len(self.unix_time), float(QL_TIME_BIN))
+        np.minimum(np.diff(self.unix_time), QL_TIME_BIN, out=timedel[:-1])
+        return timedel
+
+    def correct_dead_time(self, chunk_size=1 << 20):
+        """ correct light curves for dead time, using the trigger rates
+
+        Args:
+            chunk_size: int
+                number of time bins processed at a time
+        Returns:
+            corrected: dict
+                live_ratio, count_rates, corrected_rates and corrected_counts
+        """
+        self.corrected = correct_dead_time(self.counts, self.triggers,
+                                           self.timedel, chunk_size)
+        return self.corrected
+
     def __getattr__(self, name):
         if name == 'data':
             return self.data
@@ -76,6 +207,27 @@ class LightCurves(QuickLook):
         """
         return self.data
 
+    @property
+    def rcr_segments(self):
+        """ run-length index of the rate control regime (RCR)
+        Returns:
+            segments: dict
+                start and stop (time bin index range), rcr, attenuator_in, start_time, start_unix, end_unix
+                (in the same time frame as unix_time) and counts (summed over the segment, one column
+                per segment) of each segment
+        """
+        starts, stops, states = reduction.segment_index(self.rcr)
+        return {
+            'start': starts,
+            'stop': stops,
+            'rcr': states,
+            'attenuator_in': states > 0,
+            'start_time': [self.time[i] for i in starts],
+            'start_unix': self.unix_time[starts],
+            'end_unix': self.unix_time[stops - 1] + self.timedel[stops - 1],
+            'counts': reduction.segment_sums(self.counts, starts, axis=1),
+        }
+
     def to_pandas(self):
         stix_df = pd.DataFrame(np.array(self.data["counts"]).T, 
                                index=self.time, 
@@ -112,3 +264,71 @@ class LightCurves(QuickLook):
 
         ax.set_yscale('log')
         return ax
+
+
+def compute_live_ratio(triggers,
+                       timedel=QL_TIME_BIN,
+                       num_trigger_groups=NUM_TRIGGER_GROUPS,
+                       chunk_size=1 << 20):
+    """ live time ratio of QL time bins, using the same model as the science data dead time correction.
+        Long arrays, e.g., months of light curves, are processed in chunks to bound temporary memory
+
+    Args:
+        triggers: array-like
+            triggers summed over the trigger accumulators
+        timedel: float or array-like
+            integration time of the time bins
+        num_trigger_groups: int
+            number of trigger accumulators the triggers are summed over
+        chunk_size: int
+            number of time bins processed at a time
+    Returns:
+        live_ratio: np.ndarray
+    """
+    triggers = np.asarray(triggers, dtype=np.float64)
+    timedel = np.broadcast_to(np.asarray(timedel, dtype=np.float64),
+                              triggers.shape)
+    live_ratio = np.empty(triggers.shape)
+    for i in range(0, len(triggers), chunk_size):
+        j = min(i + chunk_size, len(triggers))
+        trig = triggers[i:j] / num_trigger_groups
+        # photon rate of a trigger accumulator
+        nin = trig / (timedel[i:j] - TRIG_TAU * trig)
+        live_ratio[i:j] = np.exp(-BETA * nin * ASIC_TAU) / (1 + nin * TRIG_TAU)
+    return live_ratio
+
+
+def correct_dead_time(counts, triggers, timedel=QL_TIME_BIN, chunk_size=1 << 20):
+    """ dead time correction of QL light curves. The outputs are allocated once and filled chunk by chunk,
+        so that temporary arrays are bounded by chunk_size
+
+    Args:
+        counts: array-like
+            light curves, energy bands x time bins
+        triggers: array-like
+            triggers summed over the trigger accumulators
+        timedel: float or array-like
+            integration time of the time bins
+        chunk_size: int
+            number of time bins processed at a time
+    Returns:
+        corrected: dict
+            live_ratio, count_rates, corrected_rates and corrected_counts
+    """
+    counts = np.asarray(counts)
+    live_ratio = compute_live_ratio(triggers, timedel, chunk_size=chunk_size)
+    timedel = np.broadcast_to(np.asarray(timedel, dtype=np.float64),
+                              live_ratio.shape)
+    corrected = {'live_ratio': live_ratio}
+    for name in ('count_rates', 'corrected_rates', 'corrected_counts'):
+        corrected[name] = np.empty(counts.shape)
+    for i in range(0, counts.shape[-1], chunk_size):
+        j = min(i + chunk_size, counts.shape[-1])
+        chunk = counts[..., i:j].astype(np.float64)
+        np.divide(chunk, timedel[i:j], out=corrected['count_rates'][..., i:j])
+        np.divide(corrected['count_rates'][..., i:j],
+                  live_ratio[i:j],
+                  out=corrected['corrected_rates'][..., i:j])
+        np.divide(chunk, live_ratio[i:j],
+                  out=corrected['corrected_counts'][..., i:j])
+    return corrected
@@ -0,0 +1,176 @@
+#!/usr/bin/python
+"""
+    Reduction of pixel data cubes (time, detector, pixel, energy) over regions.
+
+    A region is a dict with optional masks over 'time', 'detectors', 'pixels' and 'energies'.
+    A mask can be a boolean array, an index array or a slice; a missing mask selects everything.
+    Sums of values and quadrature sums of errors of all regions are computed in a single pass over the data.
+
+    Example:
+        regions = {'top': {'pixels': slice(0, 4)},
+                   'small': {'pixels': slice(8, 12), 'detectors': [0, 1, 2]}}
+        result = sum_regions(counts, regions, errors=counts_err)
+        result['top'], result['top_err']
+
+    Time bins can also be grouped into segments of constant state, e.g., the rate control regime (RCR),
+    with segment_index and summed per segment with segment_sums.
+"""
+import numpy as np
+
+
+def mask_to_weights(mask, size):
+    """
+        Convert a mask to an array of 0/1 weights
+    Args
+        mask: None, slice, boolean array or index array
+        size: int
+            length of the axis
+    Returns
+        weights: np.ndarray
+    """
+    weights = np.zeros(size)
+    if mask is None:
+        weights[:] = 1
+    elif isinstance(mask, slice):
+        weights[mask] = 1
+    else:
+        mask = np.asarray(mask)
+        if mask.dtype == bool and mask.size != size:
+            raise ValueError(
+                f'Boolean mask of size {mask.size} does not match axis of size {size}')
+        weights[mask] = 1
+    return weights
+
+
+def _region_weights(regions, shape):
+    num_t, num_det, num_pix, num_e = shape
+    time_w = np.stack([mask_to_weights(r.get('time'), num_t) for r in regions])
+    det_pix_w = np.stack([
+        np.outer(mask_to_weights(r.get('detectors'), num_det),
+                 mask_to_weights(r.get('pixels'), num_pix)).ravel()
+        for r in regions
+    ])
+    energy_w = np.stack(
+        [mask_to_weights(r.get('energies'), num_e) for r in regions])
+    return time_w, det_pix_w, energy_w
+
+
+def sum_regions(values,
+                regions,
+                errors=None,
+                keep_energy=True,
+                backend='auto',
+                chunk_size=256):
+    """
+        Sum values and errors (in quadrature) of a 4-D cube over many regions in one pass
+    Args
+        values: np.ndarray
+            cube of shape (time, detector, pixel, energy), e.g., counts. Memory-mapped arrays are fine,
+            they are read chunk by chunk
+        regions: dict
+            region definitions by name
+        errors: np.ndarray or None
+            errors of the values, same shape as values
+        keep_energy: bool
+            return spectra (one value per energy bin, zero outside the energy mask) instead of totals
+        backend: str
+            'matmul' projects all regions at once with a matrix product, efficient for many regions;
+            'slice' sums each region separately, efficient for one or two regions; 'auto' picks one
+        chunk_size: int
+            number of time bins processed at a time
+    Returns
+        result: dict
+            sums by region name, and errors by region name + '_err' if errors are given
+    """
+    names = list(regions)
+    specs = [regions[name] for name in names]
+    shape = values.shape
+    time_w, det_pix_w, energy_w = _region_weights(specs, shape)
+    if backend == 'auto':
+        backend = 'slice' if len(names) <= 2 else 'matmul'
+
+    used_t = np.flatnonzero(time_w.any(axis=0))
+    first, last = (used_t[0], used_t[-1] + 1) if used_t.size else (0, 0)
+
+    num_det_pix = shape[1] * shape[2]
+    sums = np.zeros((len(names), shape[3]))
+    sq_sums = np.zeros((len(names), shape[3])) if errors is not None else None
+
+    for i in range(first, last, chunk_size):
+        j = min(i + chunk_size, last)
+        chunks = [np.asarray(values[i:j], dtype=np.float64)]
+        if errors is not None:
+            chunks.append(np.square(np.asarray(errors[i:j], dtype=np.float64)))
+        for chunk, acc in zip(chunks, (sums, sq_sums)):
+            if backend == 'matmul':
+                # (R, D*P) x (n, D*P, E) -> (n, R, E)
+                projected = np.matmul(det_pix_w,
+                                      chunk.reshape(j - i, num_det_pix, -1))
+                acc += np.einsum('rn,nre->re', time_w[:, i:j], projected)
+            else:
+                for k, spec in enumerate(specs):
+                    t_idx = np.flatnonzero(time_w[k, i:j])
+                    if t_idx.size == 0:
+                        continue
+                    sub = chunk[t_idx]
+                    det_mask = spec.get('detectors')
+                    pix_mask = spec.get('pixels')
+                    if det_mask is not None:
+                        sub = sub[:, det_mask]
+                    if pix_mask is not None:
+                        sub = sub[:, :, pix_mask]
+                    acc[k] += sub.sum(axis=(0, 1, 2))
+
+    sums *= energy_w
+    result = {}
+    for k, name in enumerate(names):
+        result[name] = sums[k] if keep_energy else sums[k].sum()
+        if errors is not None:
+            sq_sums[k] *= energy_w[k]
+            result[f'{name}_err'] = np.sqrt(
+                sq_sums[k] if keep_energy else sq_sums[k].sum())
+    return result
+
+
+def segment_index(states):
+    """
+        Run-length index of a state array, e.g., the rate control regime of time bins
+    Args
+        states: array-like
+            state of each time bin
+    Returns
+        starts, stops: np.ndarray
+            index of the first time bin of each segment and the index after its last time bin
+        values: np.ndarray
+            state of each segment
+    """
+    states = np.asarray(states)
+    if states.size == 0:
+        empty = np.array([], dtype=int)
+        return empty, empty, states[:0]
+    changes = np.flatnonzero(states[1:] != states[:-1]) + 1
+    starts = np.concatenate(([0], changes))
+    stops = np.append(changes, len(states))
+    return starts, stops, states[starts]
+
+
+def segment_sums(values, starts, axis=0):
+    """
+        Sum values over segments in one pass
+    Args
+        values: np.ndarray
+            values, e.g., a spectrogram
+        starts: np.ndarray
+            index of the first element of each segment along axis, from segment_index
+        axis: int
+            time axis
+    Returns
+        sums: np.ndarray
+            one value per segment along axis
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(starts) == 0:
+        shape = list(values.shape)
+        shape[axis] = 0
+        return np.zeros(shape)
+    return np.add.reduceat(values, starts, axis=axis)
@@ -3,7 +3,9 @@
     This module provides APIs to retrieve Quick-look data from STIX data center , and provides tools to display the data
 
 """
+import os
 import numpy as np
+import joblib
 from astropy.io import fits
 from astropy.time import Time
 from astropy.table import Table
@@ -14,11 +16,17 @@ from stixdcpy.logger import logger
 from stixdcpy import io as sio
 from stixdcpy.net import FitsQuery as freq
 from stixdcpy import integer_compression as sic
+from stixdcpy import utils
+from stixdcpy import store as sst
+from stixdcpy import cache as rcache
+from stixdcpy import reduction
+from stixdcpy.shared import SharedArray, SharedArrays
 
 from stixdcpy import net as net
 from stixdcpy import instrument as inst
 
-from pathlib import PurePath
+from pathlib import Path, PurePath
+from functools import cached_property
 from datetime import datetime as dt
 from datetime import timedelta as td
 
@@ -28,6 +36,8 @@ ASIC_TAU = 2.58e-6 # 20 ns uncertainty in FPGA
 #updated on July 4, 2023, based on measurements with the ground unit by Olivier, Hualin, Stefan and Sam
 TRIG_TAU = FPGA_TAU + ASIC_TAU
 # STIX detector parameters
+TRIGGER_INDEX_OF_DETECTORS = np.array(
+    [inst.detector_id_to_trigger_index(i) for i in range(32)])
 
 
 class ScienceData(sio.IO):
@@ -36,16 +46,61 @@ class ScienceData(sio.IO):
 
     """
 
-    def __init__(self, fname=None, request_id=None):
+    def __init__(self,
+                 fname=None,
+                 request_id=None,
+                 memmap=True,
+                 columns=None,
+                 start_utc=None,
+                 end_utc=None,
+                 error_dtype=None,
+                 compact=False):
+        """
+        Arguments:
+        fname: str
+            FITS filename
+        request_id: int
+            bulk science data request unique ID
+        memmap: bool
+            memory-map the FITS file, so that only the accessed rows of the DATA table are read from disk
+        columns: list or None
+            DATA table columns to be loaded, e.g. ['triggers']. All columns are loaded if not given
+        start_utc, end_utc: str, datetime or None
+            only time bins overlapping with this time range are loaded
+        error_dtype: numpy dtype or None
+            dtype of the error arrays, e.g. np.float32 to halve their memory footprint. float64 if not given
+        compact: bool
+            convert counts and triggers to native-endian uint32 (or float32) once when loading, and compute
+            count rate and error cubes in float32. Sums are still accumulated in float64.
+            Counts are loaded into memory in this mode
+        """
         self.fname = fname
         self.data_type = None
         if not fname:
             raise Exception("FITS filename not specified")
         self.request_id = request_id
         self.time_shift_applied = 0
-        self.hdul = fits.open(fname)
+        self.memmap = memmap
+        self.columns = columns
+        self.start_utc = start_utc
+        self.end_utc = end_utc
+        self._closed = False
+        self.hdul = fits.open(fname, memmap=memmap)
+        self._row_range = (0, None)
+        self._time_bin_shifted = False
+        self._shared = {}
         self.energies = []
         self.corrected = None
+        self.unix_time = None
+        self.datetime64 = None
+        self._datetime = None
+        self.compact = compact
+        self.error_dtype = np.float32 if (compact and
+                                          error_dtype is None) else error_dtype
+        # dtype of count rate cubes, numpy default if None
+        self.rate_dtype = np.float32 if compact else None
+        self.error_sources = {}
+        self._native = {}
         # self.read_data()
 
     @property
@@ -56,25 +111,225 @@ class ScienceData(sio.IO):
         return f'<a href="{link}">{link}</a>'
 
     
-    @property
+    @cached_property
     def trigger_error(self):
-        try:
-            trig_err=self.hdul['data'].data['triggers_comp_err']
-        except KeyError:
-            trig_err=self.hdul['data'].data['triggers_err']
+        return self._combined_error('trigger_error',
+                                    ('triggers_comp_err', 'triggers_err'),
+                                    self.triggers)
 
-        return error_computation(trig_err,
-                                 self.triggers)
+    def _combined_error(self, name, columns, quantity):
+        """
+            Combine the errors read from the first available FITS column with Poisson errors.
+            The origin of the errors is recorded in error_sources
+        Args
+            name: str
+                name of the error array
+            columns: tuple
+                candidate error columns
+            quantity: np.ndarray
+                counts the Poisson errors are computed from
+        Returns
+            errors: np.ndarray
+        """
+        for column in columns:
+            if column in self.hdul['DATA'].columns.names:
+                break
+        else:
+            raise KeyError(f'None of the error columns {columns} found')
+        given_error = to_native(self.read_column(column))
+        # in some FITS files compression errors are zeros
+        self.error_sources[name] = f'{column}+poisson' if np.any(
+            given_error) else 'poisson'
+        return error_computation(given_error, quantity, self.error_dtype)
 
     @property
     def filename(self):
         return self.fname
 
+    @property
+    def hdul(self):
+        """
+            HDU list of the FITS file. If the file was closed with close(), e.g., at the end of a with block,
+            it is opened again on demand, because errors and other columns are read lazily. Call close()
+            again to release it
+        """
+        if self._closed:
+            logger.info(f'{self.fname} was closed, opening it again')
+            self.hdul = fits.open(self.fname, memmap=self.memmap)
+        return self._hdul
 
+    @hdul.setter
+    def hdul(self, hdul):
+        self._hdul = hdul
+        self._closed = False
 
+    def invalidate(self, *names):
+        """
+            Drop cached derived arrays so that they are recomputed on next access
+        Args
+            names: str
+                names of the cached properties to drop. All are dropped if not given
+        """
+        if not names:
+            self._native = {}
+        for name in names or self._cached_property_names():
+            if name not in self._shared:
+                self.__dict__.pop(name, None)
 
+    def native(self, name):
+        """
+            Contiguous native-endian version of a data array, e.g., counts.
+            Arithmetic on big-endian FITS columns creates a byte-swapped temporary copy in every operation;
+            the array is instead converted once on first use and reused until the data are reloaded.
+            Arrays which are already native, e.g. in compact mode, are returned without copying
+        Args
+            name: str
+                attribute name, e.g., 'counts' or 'pixel_counts'
+        Returns
+            np.ndarray
+        """
+        source = getattr(self, name)
+        for src, arr in self._native.values():
+            if src is source:
+                return arr
+        arr = to_native(source)
+        if arr is not source:
+            self._native[name] = (source, arr)
+        return arr
 
+    @classmethod
+    def _cached_property_names(cls):
+        return [
+            key for key in dir(cls)
+            if isinstance(getattr(cls, key, None), cached_property)
+        ]
+
+    @cached_property
+    def checksum(self):
+        """
+            checksum of the FITS file, derived from the CHECKSUM keywords of the HDUs if they are available
+        """
+        return utils.fits_checksum(self.fname, self.hdul)
 
+    @cached_property
+    def trigger_rates(self):
+        timedel = self.timedel[:, None] if self.triggers.ndim > 1 else self.timedel
+        return self.triggers / timedel
+
+    @cached_property
+    def rcr_segments(self):
+        """
+            Run-length index of the rate control regime (RCR), computed once.
+            The attenuator is inserted during segments with RCR > 0
+        Returns
+            dict with start and stop (time bin index range), rcr, attenuator_in, duration,
+            start_unix and end_unix of each segment
+        """
+        if self.rcr is None:
+            raise ValueError('RCR not loaded')
+        starts, stops, states = reduction.segment_index(self.rcr)
+        # same time frame as unix_time
+        bin_start = (self.T0_unix + self.time - 0.5 * self.timedel +
+                     self.time_shift_applied)
+        return {
+            'start': starts,
+            'stop': stops,
+            'rcr': states,
+            'attenuator_in': states > 0,
+            'duration': reduction.segment_sums(self.timedel, starts),
+            'start_unix': bin_start[starts],
+            'end_unix': bin_start[stops - 1] + self.timedel[stops - 1],
+        }
+
+    @property
+    def datetime(self):
+        """
+            python datetime objects of the time bins, only created on first access
+        """
+        if self._datetime is None and self.datetime64 is not None:
+            self._datetime = sdt.datetime64_to_datetime(self.datetime64)
+        return self._datetime
+
+    def close(self):
+        """
+            Close the FITS file. Arrays already loaded remain available; data read lazily afterwards,
+            e.g., errors, open the file again (see hdul)
+        """
+        hdul = self.__dict__.get('_hdul')
+        if hdul is not None and not self._closed:
+            hdul.close()
+            self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_column(self, name, shifted=True, rows=None):
+        """
+            Read a column of the DATA table, restricted to the selected time rows.
+            Unscaled columns are views of the memory-mapped table, thus only the selected rows are read from disk
+        Args
+            name: str
+                column name
+            shifted: bool
+                apply the time bin shift correction to the column
+            rows: tuple or None
+                (start, stop) row range relative to the selected time rows
+        Returns
+            column: np.ndarray
+        """
+        start, stop = self._row_range
+        if rows is not None:
+            start, stop = start + rows[0], start + rows[1]
+        if shifted and self._time_bin_shifted:
+            start, stop = start + 1, stop + 1
+        column = self.hdul['DATA'].columns[name]
+        bscale = 1 if column.bscale is None else column.bscale
+        bzero = 0 if column.bzero is None else column.bzero
+        if bscale == 1 and bzero == 0:
+            return self.hdul['DATA'].data[name][start:stop]
+        # astropy would scale the entire column, only scale the selected rows here
+        raw = np.recarray.field(self.hdul['DATA'].data, name)[start:stop]
+        if bscale == 1 and raw.dtype.kind == 'i' and bzero == 2**(
+                8 * raw.dtype.itemsize - 1):
+            # pseudo-unsigned integers (TZERO = 2**(bits-1)): flipping the sign bit is lossless
+            # and keeps the unsigned dtype
+            unsigned = raw.dtype.newbyteorder('=').str.replace('i', 'u')
+            sign_bit = np.array(bzero, dtype=unsigned)
+            return np.bitwise_xor(raw.view(raw.dtype.str.replace('i', 'u')),
+                                  sign_bit,
+                                  dtype=unsigned)
+        if bscale == 1 and float(bzero).is_integer():
+            return raw.astype(np.int64) + int(bzero)
+        return raw * float(bscale) + float(bzero)
+
+    def select_rows(self, time, timedel, start_utc=None, end_utc=None):
+        """
+            Get the range of time bins overlapping with [start_utc, end_utc]
+        Args
+            time, timedel: np.ndarray
+                time bin centers relative to T0 and integration times
+            start_utc, end_utc: str, datetime or None
+                time range. The time range given at loading is used if both are None
+        Returns
+            start, stop: int
+                row index range
+        """
+        if start_utc is None and end_utc is None:
+            start_utc, end_utc = self.start_utc, self.end_utc
+        if start_utc is None and end_utc is None:
+            return 0, len(time)
+        start = sdt.utc2unix(start_utc) - self.T0_unix if start_utc else -np.inf
+        end = sdt.utc2unix(end_utc) - self.T0_unix if end_utc else np.inf
+        start_row = np.searchsorted(time + 0.5 * timedel, start, side='right')
+        end_row = np.searchsorted(time - 0.5 * timedel, end, side='left')
+        if end_row <= start_row:
+            raise ValueError(
+                f'No data found between {start_utc} and {end_utc} in {self.fname}'
+            )
+        return int(start_row), int(end_row)
 
     def read_fits(self, light_time_correction=True):
         """
@@ -91,40 +346,49 @@ class ScienceData(sio.IO):
             self.T0_utc = self.hdul['PRIMARY'].header['DATE-BEG']
         except KeyError:
             self.T0_utc = self.hdul['PRIMARY'].header['DATE_BEG']
-        self.counts = self.data['counts']
-        # counts is a 4d array:  time_bin_index, detector, pixel, energy
 
         self.light_time_del = self.hdul['PRIMARY'].header['EAR_TDEL']
         self.light_time_corrected = light_time_correction
 
         self.T0_unix = sdt.utc2unix(self.T0_utc)
-        self.triggers = self.data['triggers']
-        self.rcr = self.data['rcr']
-
-        self.timedel = self.data['timedel']
-        self.time = self.data['time']
-
-        if self.is_time_bin_shifted() and len(self.timedel) > 1:
-            self.timedel = self.timedel[:-1]
-            self.time = self.time[1:]
-            if self.data_type == 'PixelData':
-                self.counts = self.counts[1:, :, :, :]
-                self.triggers = self.triggers[1:, :]
-                self.rcr = self.rcr[1:]
-            elif self.data_type == 'Spectrogram':
-                self.counts = self.counts[1:, :]
-                self.triggers = self.triggers[1:]
-                # self.rcr = self.rcr[1:]
+
+        timedel = self.data['timedel']
+        time = self.data['time']
+        self._time_bin_shifted = self.is_time_bin_shifted() and len(timedel) > 1
+        if self._time_bin_shifted:
+            timedel = timedel[:-1]
+            time = time[1:]
             logger.info('Shifted time bins have been corrected automatically!')
 
+        self._row_range = self.select_rows(time, timedel)
+        start, stop = self._row_range
+        self.timedel = to_native(timedel[start:stop])
+        self.time = to_native(time[start:stop])
+
+        def load(name, shifted=True):
+            if self.columns is not None and name not in self.columns:
+                return None
+            return self.read_column(name, shifted)
+
+        self.counts = load('counts')
+        # counts is a 4d array:  time_bin_index, detector, pixel, energy
+        self.triggers = to_native(load('triggers'))
+        # rcr of spectrograms is not affected by the time bin shift
+        self.rcr = to_native(load('rcr', shifted=self.data_type == 'PixelData'))
+        if self.compact:
+            self.counts = compact_array(self.counts)
+            self.triggers = compact_array(self.triggers)
+            self.timedel = np.asarray(self.timedel, dtype=np.float32)
+            self.time = np.asarray(self.time, dtype=np.float64)
+
         self.request_id = self.hdul['CONTROL'].data['request_id']
 
         self.time_shift_applied = 0 if light_time_correction else self.light_time_del
-        self.datetime = [
-            sdt.unix2datetime(self.T0_unix + x + y * 0.5 +
-                              self.time_shift_applied)
-            for x, y in zip(self.time, self.timedel)
-        ]
+        # unix time and datetime64 of the time bins, computed in one shot
+        self.unix_time = (self.T0_unix + self.time.astype(np.float64) +
+                          0.5 * self.timedel + self.time_shift_applied)
+        self.datetime64 = sdt.unix2datetime64(self.unix_time)
+        self._datetime = None
 
         self.duration = self.time[-1] - self.time[0] + (self.timedel[0] +
                                                         self.timedel[-1]) / 2
@@ -155,13 +419,8 @@ class ScienceData(sio.IO):
 
         if self.data_type == 'PixelData':
             self.pixel_counts = self.counts
-            self.pixel_count_rates = self.pixel_counts / self.timedel[:, None,
-                                                                      None,
-                                                                      None]
-            self.trigger_rates = self.triggers / self.timedel[:, None]
-        elif self.data_type == 'Spectrogram':
-            self.count_rates = self.counts / self.timedel[:, None]
-            self.trigger_rates = self.triggers / self.timedel
+        # rates and spectra are cached properties computed on first access
+        self.invalidate()
 
     def is_time_bin_shifted(self):
         """
@@ -177,7 +436,7 @@ class ScienceData(sio.IO):
         return (self.T0_unix< sdt.utc2unix('2021-12-09T14:00:00'))
 
     @classmethod
-    def from_sdc(cls, request_id, level='L1'):
+    def from_sdc(cls, request_id, level='L1', **kwargs):
         '''
         download science data file from stix data center
         Parameters
@@ -186,7 +445,8 @@ class ScienceData(sio.IO):
             bulk science data request unique ID; Unique IDs can be found on the science data web page  at stix data center
         level:  str
             ground processing level. Options: L1, L1A, L2 or any. Default value is L1A
-
+        kwargs:
+            loading options, see ScienceData.__init__
 
         Returns
         ------
@@ -194,40 +454,145 @@ class ScienceData(sio.IO):
         '''
         # request_id = request_id
         fname = freq.fetch_bulk_science_by_request_id(request_id, level)
-        return cls(fname, request_id)
+        return cls(fname, request_id, **kwargs)
 
     @classmethod
-    def from_fits(cls, filename):
+    def from_fits(cls, filename, **kwargs):
         """
         factory class
         Arguments:
         filename: str
             FITS filename
+        kwargs:
+            loading options, see ScienceData.__init__
         """
         request_id = None
-        return cls(filename, request_id)
+        return cls(filename, request_id, **kwargs)
 
     def get_energy_range_slicer(self, elow, ehigh):
-        sel = []
-        i = 0
-        for a, b in zip(self.energies['e_low'], self.energies['e_high']):
-            if a >= elow and b <= ehigh:
-                sel.append(i)
-            i += 1
-        return slice(min(sel), max(sel))
+        """
+            Get a slice of the energy bins within [elow, ehigh] keV
+        """
+        sel = np.flatnonzero((np.asarray(self.energies['e_low']) >= elow)
+                             & (np.asarray(self.energies['e_high']) <= ehigh))
+        if sel.size == 0:
+            raise ValueError(f'No energy bins between {elow} and {ehigh} keV')
+        return slice(sel[0], sel[-1] + 1)
 
-    def rebin(self, ebins, min_tbin=0):
+    def rebin(self, ebins=None, min_tbin=0):
         """
          Energy rebin and time rebin
          Arguments:
          ebins: list or numpy array
-            energy bin range in units of keV
+            energy bin edges in units of keV, e.g. [4, 10, 15, 25, 50, 84]. All energy bins are merged if not given
          min_tbin: float
-            minimum time bin, shorter time bins are merged
+            minimum time bin, shorter time bins are merged. Time bins are not merged across attenuator motions
          Returns:
             an object containing rebinned light curves
         """
-        pass
+        if self.counts is None:
+            raise ValueError('Counts are not loaded!')
+        counts_err = (self.pixel_counts_error
+                      if self.data_type == 'PixelData' else self.counts_error)
+        trig_err = self.trigger_error if self.triggers is not None else None
+
+        if ebins is None:
+            ebins = [self.ebins_low[0], self.ebins_high[-1]]
+        e_starts, e_stop = get_energy_bin_starts(self.ebins_low, ebins)
+        t_starts = get_time_bin_starts(self.timedel, min_tbin, self.rcr)
+
+        def rebin_time(arr):
+            return arr if t_starts.size == arr.shape[0] else np.add.reduceat(
+                arr, t_starts, axis=0)
+
+        def rebin_energy(arr):
+            return np.add.reduceat(arr[..., :e_stop], e_starts, axis=-1)
+
+        counts = rebin_time(rebin_energy(self.native('counts')))
+        counts_err = np.sqrt(rebin_time(rebin_energy(counts_err**2)))
+        triggers, triggers_err = None, None
+        if self.triggers is not None:
+            triggers = rebin_time(self.triggers)
+            triggers_err = np.sqrt(rebin_time(trig_err**2))
+
+        timedel = rebin_time(self.timedel.astype(np.float64))
+        time = self.time[t_starts] - 0.5 * self.timedel[t_starts] + 0.5 * timedel
+        e_stops = np.append(e_starts[1:], e_stop)
+        return RebinnedData(data_type=self.data_type,
+                            T0_utc=self.T0_utc,
+                            T0_unix=self.T0_unix,
+                            time=time,
+                            timedel=timedel,
+                            time_shift_applied=self.time_shift_applied,
+                            counts=counts,
+                            counts_err=counts_err,
+                            triggers=triggers,
+                            triggers_err=triggers_err,
+                            rcr=None if self.rcr is None else self.rcr[t_starts],
+                            ebins_low=np.asarray(self.ebins_low)[e_starts],
+                            ebins_high=np.asarray(self.ebins_high)[e_stops - 1])
+
+    def _store_arrays(self):
+        """
+            arrays indexed by time to be written by to_store, and their detector axes
+        """
+        arrays = {
+            'time': self.time,
+            'timedel': self.timedel,
+            'triggers': self.triggers,
+            'rcr': self.rcr,
+            'counts': self.counts,
+        }
+        return arrays, {}
+
+    def to_store(self, path, chunk_size=256, compress=False, overwrite=False):
+        """
+            Save the data and dead time correction results (if computed) to a time-chunked array store,
+            which can be loaded with stixdcpy.store.load, partially by time range and detectors
+        Args
+            path: str
+                store folder
+            chunk_size: int
+                number of time bins per chunk
+            compress: bool
+                compress the chunks. Uncompressed chunks are memory-mapped when loaded
+            overwrite: bool
+                replace an existing store at path
+        Returns
+            stixdcpy.store.ArrayStore
+        """
+        time_arrays, detector_axes = self._store_arrays()
+        arrays = dict(time_arrays)
+        arrays.update({
+            'ebins_low': np.asarray(self.ebins_low),
+            'ebins_high': np.asarray(self.ebins_high),
+            'energy_bin_mask': np.ravel(self.energy_bin_mask),
+        })
+        control = self.hdul['CONTROL'].data
+        for names in (('detector_masks', 'detector_mask'), ('pixel_masks',
+                                                             'pixel_mask')):
+            for name in names:
+                if name in control.names:
+                    arrays[names[0]] = np.asarray(control[name])
+                    break
+        meta = {
+            'data_type': self.data_type,
+            'fname': str(self.fname),
+            'request_id': self.request_id,
+            'T0_utc': self.T0_utc,
+            'T0_unix': self.T0_unix,
+            'duration': self.duration,
+            'time_shift_applied': self.time_shift_applied,
+            'light_time_corrected': self.light_time_corrected,
+        }
+        return sst.ArrayStore.write(path,
+                                    arrays,
+                                    meta,
+                                    time_arrays=list(time_arrays),
+                                    detector_axes=detector_axes,
+                                    chunk_size=chunk_size,
+                                    compress=compress,
+                                    overwrite=overwrite)
 
     def save(self, filename=None):
         '''
@@ -250,12 +615,96 @@ class ScienceData(sio.IO):
             logger.error(e)
 
     def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if self.__dict__.get('_detached'):
+            # unpickled object, the FITS file is opened on first data access
+            self.reopen()
+            return getattr(self, name)
         if name == 'data':
             return self.hdul
         elif name == 'type':
             return self.hdul.get('data_type', 'INVALID_TYPE')
         elif name == 'filename':
             return self.fname
+        raise AttributeError(
+            f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def __getstate__(self):
+        """
+            Only the filename, loading options and small metadata are pickled.
+            Data arrays are read again from the FITS file after unpickling,
+            arrays published by share_memory() are attached from shared memory
+        """
+        cached_names = self._cached_property_names()
+        state = {'_detached': True, '_dropped': []}
+        for key, val in self.__dict__.items():
+            if key in ('_hdul', '_closed', 'data', '_detached', '_dropped',
+                       '_native') or key in cached_names or key in self._shared:
+                continue
+            if isinstance(val, (np.ndarray, dict, fits.FITS_rec)) or (
+                    isinstance(val, list) and key != 'columns'):
+                if key not in ('_shared', 'error_sources'):
+                    state['_dropped'].append(key)
+                    continue
+            state[key] = val
+        state['_dropped'].extend(self.__dict__.get('_dropped', []))
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name, handle in self._shared.items():
+            self.__dict__[name] = handle.array
+
+    def reopen(self):
+        """
+            Open the FITS file again and reload the data, e.g., after unpickling
+        """
+        self.__dict__.pop('_detached', None)
+        self.hdul = fits.open(self.fname, memmap=self.memmap)
+        self.read_fits(light_time_correction=self.light_time_corrected)
+        # arrays which can not be recreated from the FITS file are reset
+        for name in self.__dict__.pop('_dropped', []):
+            self.__dict__.setdefault(name, None)
+        if self.__dict__.get('pixel_counts_comp_stat_err') is None:
+            # errors are read from the FITS file again, not from the compression look-up table
+            self.__dict__['comp_skm'] = None
+        for name, handle in self._shared.items():
+            self.__dict__[name] = handle.array
+
+    def share_memory(self, *names):
+        """
+            Publish arrays to shared memory, so that they travel to other processes
+            as zero-copy views instead of being pickled or recomputed
+        Args
+            names: str
+                attribute names, e.g., 'spectrogram', 'pixel_counts_comp_stat_err'
+        Returns
+            dict of SharedArray handles
+        """
+        for name in names:
+            if name in self._shared:
+                continue
+            handle = SharedArray.publish(getattr(self, name))
+            self._shared[name] = handle
+            self.__dict__[name] = handle.array
+        return self._shared
+
+    def release_shared_memory(self):
+        """
+            Free the shared memory blocks published by share_memory().
+            Arrays are copied back to process memory. Cached arrays which may alias the blocks,
+            e.g., pixel_counts_error or native copies, are dropped and recomputed on next access
+        """
+        handles, self._shared = self._shared, {}
+        for name, handle in handles.items():
+            self.__dict__[name] = np.array(handle.array)
+        self._native = {}
+        for name in self._cached_property_names():
+            if name not in handles:
+                self.__dict__.pop(name, None)
+        for handle in handles.values():
+            handle.unlink()
 
 
 class PixelData(ScienceData):
@@ -263,32 +712,68 @@ class PixelData(ScienceData):
     Tools to analyze STIX pixel data
     """
 
-    def __init__(self, fname, request_id, ltc=False):
-        super().__init__(fname, request_id)
+    def __init__(self, fname, request_id, ltc=False, **kwargs):
+        """
+        Arguments:
+        fname: str
+            FITS filename
+        request_id: int
+            request unique ID
+        ltc: bool
+            light time correction
+        kwargs:
+            loading options passed to ScienceData, i.e., memmap, columns, start_utc and end_utc
+        """
+        super().__init__(fname, request_id, **kwargs)
         self.data_type = 'PixelData'
-        self.pixel_count_rates = None
         self.correct_pixel_count_rates = None
         self.read_fits(light_time_correction=ltc)
         self.pixel_counts_comp_stat_err= None
-        self.make_spectra()
-    
+        self.comp_skm = None
 
-    def make_spectra(self, pixel_counts=None):
-        if pixel_counts is None:
-            pixel_counts = self.pixel_counts
+    @cached_property
+    def pixel_count_rates(self):
+        return np.divide(self.native('pixel_counts'),
+                         self.timedel[:, None, None, None],
+                         dtype=self.rate_dtype)
+
+    @cached_property
+    def spectrogram(self):
         # integrate detector and pixel
-        self.spectrogram = np.sum(pixel_counts, axis=(1, 2))
-        self.count_rate_spectrogram = self.spectrogram / self.timedel[:, np.
-                                                                      newaxis]
-        self.spectrum = np.sum(pixel_counts, axis=(0, 1, 2))
-
-        self.mean_pixel_rate_spectra = np.sum(self.pixel_counts,
-                                              axis=0) / self.duration
-        self.mean_pixel_rate_spectra_err = np.sqrt(
-            self.mean_pixel_rate_spectra) / np.sqrt(self.duration)
+        return np.sum(self.native('pixel_counts'), axis=(1, 2))
+
+    @cached_property
+    def count_rate_spectrogram(self):
+        return self.spectrogram / self.timedel[:, np.newaxis]
+
+    @cached_property
+    def spectrum(self):
+        return np.sum(self.spectrogram, axis=0)
+
+    @cached_property
+    def mean_pixel_rate_spectra(self):
         # sum over all time bins and then divide them by the duration, counts per second
+        return np.sum(self.native('pixel_counts'), axis=0) / self.duration
 
-        self.pixel_total_counts = np.sum(self.pixel_counts, axis=(0, 3))
+    @cached_property
+    def mean_pixel_rate_spectra_err(self):
+        return np.sqrt(self.mean_pixel_rate_spectra) / np.sqrt(self.duration)
+
+    @cached_property
+    def pixel_total_counts(self):
+        return np.sum(self.native('pixel_counts'), axis=(0, 3))
+
+    def make_spectra(self, pixel_counts=None):
+        """
+            (Re)compute the spectra. Spectra are computed lazily from pixel_counts;
+            if pixel_counts is given, spectrogram and spectrum are computed from it instead
+        """
+        self.invalidate('spectrogram', 'count_rate_spectrogram', 'spectrum',
+                        'mean_pixel_rate_spectra', 'mean_pixel_rate_spectra_err',
+                        'pixel_total_counts')
+        if pixel_counts is not None:
+            self.spectrogram = np.sum(pixel_counts, axis=(1, 2))
+            self.spectrum = np.sum(pixel_counts, axis=(0, 1, 2))
 
     def compute_errors_from_counts(self, skm=None):
         """
@@ -306,11 +791,34 @@ class PixelData(ScienceData):
                 raise Exception("Couldn't find SKM found in the FITS file!")
         else:
             s,k,m=skm
+        s, k, m = int(s), int(k), int(m)
+        self.comp_skm = (s, k, m)
+        self.invalidate('pixel_counts_error')
+        dtype = np.dtype(self.error_dtype or np.float64).str
+        cached = rcache.lookup(self, 'PixelData.compute_errors_from_counts',
+                               skm=self.comp_skm, dtype=dtype)
+        if cached is not None:
+            self.pixel_counts_comp_stat_err = cached['pixel_counts_comp_stat_err']
+            return
         comp = sic.Compression(s,k,m, include_stat_error=True)
-        self.pixel_counts_comp_stat_err=comp.get_errors(self.counts)
+        self.pixel_counts_comp_stat_err = comp.get_errors(self.native('counts')).astype(
+            dtype, copy=False)
+        rcache.store(self, 'PixelData.compute_errors_from_counts',
+                     {'pixel_counts_comp_stat_err': self.pixel_counts_comp_stat_err},
+                     skm=self.comp_skm, dtype=dtype)
 
 
     @property
+    def error_skm(self):
+        """
+            compression scheme of the errors computed with compute_errors_from_counts if they are used,
+            otherwise None (errors read from the FITS file). Part of the cache keys of results depending on errors
+        """
+        if self.pixel_counts_comp_stat_err is None:
+            return None
+        return self.comp_skm
+
+    @cached_property
     def pixel_counts_error(self):
         """
             compute or read counts errors from FITS file
@@ -318,15 +826,11 @@ class PixelData(ScienceData):
 
         if self.pixel_counts_comp_stat_err is not None:
             #if already computed
+            self.error_sources['pixel_counts_error'] = 'lut'
             return self.pixel_counts_comp_stat_err
-        else:
-            try:
-                counts_err=self.hdul['data'].data['counts_err']
-            except KeyError:
-                counts_err=self.hdul['data'].data['counts_comp_err']
-                #in some FITS files compression errors are zeros
-            return error_computation(counts_err,
-                                 self.pixel_counts)
+        return self._combined_error('pixel_counts_error',
+                                    ('counts_err', 'counts_comp_err'),
+                                    self.native('pixel_counts'))
 
 
 
@@ -376,8 +880,9 @@ class PixelData(ScienceData):
             live_ratio = np.zeros((time_bins.size, 32))
             time_bins = time_bins[:, :, None, None]
 
-            count_rate = counts_arr / time_bins
-            count_rate_err = counts_err_arr / time_bins
+            dtype = self.rate_dtype
+            count_rate = np.divide(counts_arr, time_bins, dtype=dtype)
+            count_rate_err = np.divide(counts_err_arr, time_bins, dtype=dtype)
             for det in range(32):
                 trig_idx = inst.detector_id_to_trigger_index(det)
                 nin = photons_in[:, trig_idx]
@@ -390,12 +895,12 @@ class PixelData(ScienceData):
             #disable live time correction
             live_ratio=live_ratio[:, :, None, None]
 
-            corrected_rate = count_rate / live_ratio
+            corrected_rate = np.divide(count_rate, live_ratio, dtype=dtype)
 
-            corrected_rate_err =count_rate_err/ live_ratio
+            corrected_rate_err = np.divide(count_rate_err, live_ratio, dtype=dtype)
 
-            corrected_counts = corrected_rate * time_bins
-            corrected_counts_err = corrected_rate_err * time_bins
+            corrected_counts = np.multiply(corrected_rate, time_bins, dtype=dtype)
+            corrected_counts_err = np.multiply(corrected_rate_err, time_bins, dtype=dtype)
             #errors of live ratio not taken into account yet
             
 
@@ -411,17 +916,181 @@ class PixelData(ScienceData):
                 'live_ratio': live_ratio
             }
 
-        self.corrected = correct(self.triggers, self.pixel_counts, self.pixel_counts_error,
+        cached = rcache.lookup(self, 'PixelData.correct_dead_time',
+                               error_skm=self.error_skm)
+        if cached is not None:
+            self.corrected = cached
+            return self.corrected
+
+        pixel_counts = self.native('pixel_counts')
+        self.corrected = correct(self.triggers, pixel_counts, self.pixel_counts_error,
                                  self.timedel)
 
         # approximate the live ratio error like Ewan does
-        above = correct(self.triggers + self.trigger_error, self.pixel_counts,self.pixel_counts_error,
+        above = correct(self.triggers + self.trigger_error, pixel_counts,self.pixel_counts_error,
                         self.timedel)
-        below = correct(self.triggers - self.trigger_error, self.pixel_counts,self.pixel_counts_error,
+        below = correct(self.triggers - self.trigger_error, pixel_counts,self.pixel_counts_error,
                         self.timedel)
         self.corrected['live_error'] = np.abs(above['live_ratio'] -
                                               below['live_ratio']) / 2
+        rcache.store(self, 'PixelData.correct_dead_time', self.corrected,
+                     error_skm=self.error_skm)
         return self.corrected
+    def iter_chunks(self, chunk_size=64, start_utc=None, end_utc=None,
+                    dead_time_correction=True):
+        """
+            Iterate over chunks of time bins. Counts and errors are read from the memory-mapped FITS file
+            chunk by chunk, hence memory usage is bounded by the chunk size. Load the data without counts,
+            e.g., PixelData(fname, None, columns=['triggers', 'rcr']), to skip reading the full count cube
+            when loading.
+        Args
+            chunk_size: int
+                number of time bins per chunk
+            start_utc, end_utc: str or None
+                time range; time bins overlapping with it are included
+            dead_time_correction: bool
+                correct counts and their errors for dead time
+        Yields
+            chunk: dict
+                rows (start and stop index of time bins), timedel, triggers, counts, counts_err,
+                and if dead_time_correction is True: live_ratio, corrected_counts, corrected_counts_err
+        """
+        start_row, end_row = self.select_rows(self.time, self.timedel,
+                                              start_utc, end_utc)
+        for i in range(start_row, end_row, chunk_size):
+            rows = (i, min(i + chunk_size, end_row))
+            counts = np.asarray(self.read_column('counts', rows=rows),
+                                dtype=np.float64)
+            if self.pixel_counts_comp_stat_err is not None:
+                counts_err = self.pixel_counts_comp_stat_err[rows[0]:rows[1]]
+            else:
+                try:
+                    err = self.read_column('counts_err', rows=rows)
+                except KeyError:
+                    err = self.read_column('counts_comp_err', rows=rows)
+                counts_err = error_computation(err, counts, self.error_dtype)
+            timedel = np.asarray(self.timedel[rows[0]:rows[1]],
+                                 dtype=np.float64)
+            triggers = np.asarray(self.read_column('triggers', rows=rows)
+                                  if self.triggers is None else
+                                  self.triggers[rows[0]:rows[1]],
+                                  dtype=np.float64)
+            chunk = {
+                'rows': rows,
+                'timedel': timedel,
+                'triggers': triggers,
+                'counts': counts,
+                'counts_err': counts_err
+            }
+            if dead_time_correction:
+                live_ratio = compute_live_ratio(triggers,
+                                                timedel)[:, :, None, None]
+                chunk['live_ratio'] = live_ratio
+                chunk['corrected_counts'] = counts / live_ratio
+                chunk['corrected_counts_err'] = counts_err / live_ratio
+            yield chunk
+
+    def reduce_in_chunks(self, chunk_size=64, start_utc=None, end_utc=None,
+                         dead_time_correction=True):
+        """
+            Compute spectra, spectrogram and region sums chunk by chunk, without loading the full count cube.
+            Partial sums and squared-error sums are added up, thus the results are exact.
+        Args
+            chunk_size: int
+                number of time bins per chunk
+            start_utc, end_utc: str or None
+                time range; time bins overlapping with it are included
+            dead_time_correction: bool
+                use dead time corrected counts
+        Returns
+            result: dict
+                pixel_spectra and pixel_spectra_err: counts summed over time, 32 x 12 x 32
+                spectrum and spectrum_err: counts summed over time, detectors and pixels
+                spectrogram and spectrogram_err: counts summed over detectors and pixels, one row per time bin
+                top, bottom, small, big, total and their errors: counts summed as in get_sum_counts
+                rows: time bin index range; duration: total integration time
+        """
+        key = 'corrected_counts' if dead_time_correction else 'counts'
+        pixel_sum, pixel_var = 0, 0
+        spectrogram, spectrogram_var = [], []
+        duration = 0
+        start_row = end_row = None
+        for chunk in self.iter_chunks(chunk_size, start_utc, end_utc,
+                                      dead_time_correction):
+            counts, var = chunk[key], chunk[key + '_err']**2
+            pixel_sum = pixel_sum + counts.sum(axis=0)
+            pixel_var = pixel_var + var.sum(axis=0)
+            spectrogram.append(counts.sum(axis=(1, 2)))
+            spectrogram_var.append(var.sum(axis=(1, 2)))
+            duration += chunk['timedel'].sum()
+            start_row = chunk['rows'][0] if start_row is None else start_row
+            end_row = chunk['rows'][1]
+
+        result = {
+            'rows': (start_row, end_row),
+            'duration': duration,
+            'pixel_spectra': pixel_sum,
+            'pixel_spectra_err': np.sqrt(pixel_var),
+            'spectrum': pixel_sum.sum(axis=(0, 1)),
+            'spectrum_err': np.sqrt(pixel_var.sum(axis=(0, 1))),
+            'spectrogram': np.concatenate(spectrogram),
+            'spectrogram_err': np.sqrt(np.concatenate(spectrogram_var)),
+        }
+        for region, pixels in (('top', slice(0, 4)), ('bottom', slice(4, 8)),
+                               ('small', slice(8, 12)), ('big', slice(0, 8)),
+                               ('total', slice(0, 12))):
+            result[region] = pixel_sum[:, pixels, :].sum(axis=(0, 1))
+            result[f'{region}_err'] = np.sqrt(pixel_var[:, pixels, :].sum(
+                axis=(0, 1)))
+        return result
+
+    def _store_arrays(self):
+        arrays, detector_axes = super()._store_arrays()
+        arrays['counts_err'] = self.pixel_counts_error
+        if self.corrected is not None:
+            for key in ('corrected_counts', 'corrected_counts_err',
+                        'live_ratio', 'live_error', 'photons_in'):
+                arrays[key] = self.corrected.get(key)
+        detector_axes.update({
+            key: 1
+            for key in ('counts', 'counts_err', 'corrected_counts',
+                        'corrected_counts_err', 'live_ratio', 'live_error')
+        })
+        return arrays, detector_axes
+
+    def share_cubes(self, corrected=True, errors=True):
+        """
+            Publish the count cubes to shared memory, so that worker processes can access them
+            without copying. The returned object is a context manager which frees the memory on exit.
+
+        Args
+            corrected: bool
+                include dead-time corrected counts
+            errors: bool
+                include count errors
+        Returns
+            shared: stixdcpy.shared.SharedArrays
+                shared arrays with keys counts, timedel, triggers and, optionally,
+                counts_err, corrected_counts, corrected_counts_err and live_ratio
+        Example:
+            with pixel_data.share_cubes() as cubes:
+                results = executor.map(analyze_detector, [cubes] * 32, range(32))
+        """
+        arrays = {
+            'counts': self.pixel_counts,
+            'timedel': self.timedel,
+            'triggers': self.triggers
+        }
+        if errors:
+            arrays['counts_err'] = self.pixel_counts_error
+        if corrected:
+            cl1 = self.corrected if self.corrected is not None else self.correct_dead_time()
+            arrays['corrected_counts'] = cl1['corrected_counts']
+            arrays['live_ratio'] = cl1['live_ratio']
+            if errors:
+                arrays['corrected_counts_err'] = cl1['corrected_counts_err']
+        return SharedArrays.publish(**arrays)
+
     def get_sum_counts(self, start_utc=None, end_utc=None) :
         """
         Calculate the total counts in different regions of a pixel data file within a specified time range.
@@ -479,15 +1148,16 @@ class PixelData(ScienceData):
             
         
        
-        sum_counts = {'top': np.sum(pixel_counts[start_i_tbin:end_i_tbin, :,0:4,:], axis=(0,1,2) ),
-                'bottom': np.sum(pixel_counts[start_i_tbin:end_i_tbin, :,4:8,:],axis=(0,1,2) ),
-                'small': np.sum(pixel_counts[start_i_tbin:end_i_tbin, :,8:,:],axis=(0,1,2) ),
-                'duration':duration,
-
-                'top_err': np.sqrt(np.sum(pixel_counts_err[start_i_tbin:end_i_tbin, :,0:4,:]**2, axis=(0,1,2) )),
-                'bottom_err': np.sqrt(np.sum(pixel_counts_err[start_i_tbin:end_i_tbin, :,4:8,:]**2,axis=(0,1,2) )),
-                'small_err': np.sqrt(np.sum(pixel_counts_err[start_i_tbin:end_i_tbin, :,8:,:]**2,axis=(0,1,2) ))
-                }
+        tbins = slice(start_i_tbin, end_i_tbin)
+        sum_counts = reduction.sum_regions(
+            pixel_counts, {
+                'top': {'time': tbins, 'pixels': slice(0, 4)},
+                'bottom': {'time': tbins, 'pixels': slice(4, 8)},
+                'small': {'time': tbins, 'pixels': slice(8, None)},
+            },
+            errors=pixel_counts_err,
+            backend='matmul')
+        sum_counts['duration'] = duration
 
         sum_counts['big'] = sum_counts['top']+sum_counts['bottom']
         sum_counts['big_err'] = np.sqrt(sum_counts['top_err']**2 
@@ -499,6 +1169,200 @@ class PixelData(ScienceData):
         return sum_counts
 
 
+    def sum_regions(self, regions, start_utc=None, end_utc=None,
+                    dead_time_correction=True, keep_energy=True):
+        """
+            Sum counts and errors over regions defined by detector, pixel, energy and time masks, in one pass
+        Args
+            regions: dict
+                region definitions by name, see stixdcpy.reduction.sum_regions
+            start_utc, end_utc: str or None
+                time range applied to all regions; time bins overlapping with it are included
+            dead_time_correction: bool
+                sum dead time corrected counts
+            keep_energy: bool
+                return spectra instead of totals
+        Returns
+            result: dict
+                sums and errors (keys with suffix _err) by region name, and duration
+        """
+        if dead_time_correction:
+            cl1 = self.corrected if self.corrected is not None else self.correct_dead_time()
+            counts, counts_err = cl1['corrected_counts'], cl1['corrected_counts_err']
+        else:
+            counts, counts_err = self.pixel_counts, self.pixel_counts_error
+        start_row, end_row = self.select_rows(self.time, self.timedel,
+                                              start_utc, end_utc)
+        tbins = np.zeros(len(self.time), dtype=bool)
+        tbins[start_row:end_row] = True
+        regions = {
+            name: dict(spec, time=tbins & reduction.mask_to_weights(
+                spec.get('time'), len(self.time)).astype(bool))
+            for name, spec in regions.items()
+        }
+        result = reduction.sum_regions(counts,
+                                       regions,
+                                       errors=counts_err,
+                                       keep_energy=keep_energy)
+        result['duration'] = np.sum(self.timedel[start_row:end_row])
+        return result
+
+    def get_window_spectra(self,
+                           windows=None,
+                           window=None,
+                           step=None,
+                           energy_bands=None,
+                           detector_slice=slice(None, None),
+                           pixel_slice=slice(None, None),
+                           dead_time_correction=False):
+        """
+        Compute spectra and light curves for many time windows in one pass, using cumulative sums over time.
+
+        Arguments:
+        windows: list or None
+            list of (start_utc, end_utc) tuples
+        window: float or None
+            window length in units of seconds, used if windows is not given
+        step: float or None
+            step between window starts in units of seconds. Default: window
+        energy_bands: list or None
+            energy band edges in keV for the light curves, e.g. [4, 10, 15, 25, 50, 84]
+        detector_slice: slice, index or boolean array
+            detectors to be included
+        pixel_slice: slice, index or boolean array
+            pixels to be included
+        dead_time_correction: bool
+            use dead time corrected counts
+        Returns:
+            result: dict
+                spectra, spectra_err: counts per window and energy bin, W x 32
+                light_curves, light_curves_err: counts per window and energy band, W x B
+                time_edges: start and end unix time of the windows, W x 2
+                rows: first and last+1 time bin index of the windows, W x 2
+                duration: integration time of the windows
+                energy_bands: low and high edges of the light-curve energy bands
+        """
+        spectrogram, variance = self._reduced_spectrogram(
+            detector_slice, pixel_slice, dead_time_correction)
+        return self._window_sums(spectrogram, variance, windows, window, step,
+                                 energy_bands)
+
+    def _reduced_spectrogram(self, detector_slice, pixel_slice,
+                             dead_time_correction):
+        """
+            spectrogram and its variance summed over the selected detectors and pixels
+        """
+        if dead_time_correction:
+            cl1 = self.corrected if self.corrected is not None else self.correct_dead_time()
+            counts, counts_err = cl1['corrected_counts'], cl1['corrected_counts_err']
+        elif (isinstance(detector_slice, slice) and isinstance(pixel_slice, slice)
+              and detector_slice == slice(None, None)
+              and pixel_slice == slice(None, None)):
+            counts, counts_err = None, self.pixel_counts_error
+        else:
+            counts, counts_err = self.native('pixel_counts'), self.pixel_counts_error
+        spectrogram = self.spectrogram if counts is None else np.sum(
+            np.asarray(counts)[:, detector_slice][:, :, pixel_slice],
+            axis=(1, 2),
+            dtype=np.float64)
+        variance = np.sum(np.square(counts_err)[:, detector_slice][:, :,
+                                                                   pixel_slice],
+                          axis=(1, 2),
+                          dtype=np.float64)
+        return spectrogram, variance
+
+    def get_rcr_segment_spectra(self,
+                                energy_bands=None,
+                                detector_slice=slice(None, None),
+                                pixel_slice=slice(None, None),
+                                dead_time_correction=False,
+                                attenuator_transmission=None):
+        """
+        Spectra and energy-band counts of each rate control regime (RCR) segment, computed in one pass
+
+        Arguments:
+        energy_bands: list or None
+            energy band edges in keV. All energy channels are summed if not given
+        detector_slice: slice, index or boolean array
+            detectors to be included
+        pixel_slice: slice, index or boolean array
+            pixels to be included
+        dead_time_correction: bool
+            use dead time corrected counts
+        attenuator_transmission: array-like or None
+            transmission of the attenuator in each energy channel, e.g.,
+            from stixdcpy.transmission.Transmission.get_attenuator_transmission.
+            If given, the spectra of the segments with the attenuator inserted are divided by it
+        Returns:
+            result: dict
+                rcr_segments entries, and spectra, spectra_err, light_curves, light_curves_err and energy_bands,
+                with one row per segment
+        """
+        spectrogram, variance = self._reduced_spectrogram(
+            detector_slice, pixel_slice, dead_time_correction)
+        return get_segment_spectra(self, spectrogram, variance, energy_bands,
+                                   attenuator_transmission)
+
+    def _window_sums(self, spectrogram, variance, windows, window, step,
+                     energy_bands):
+        starts, ends = get_time_windows(self, windows, window, step)
+        first, last = get_window_rows(self.time, self.timedel, starts, ends)
+
+        def window_sum(arr):
+            cumsum = np.zeros((arr.shape[0] + 1, ) + arr.shape[1:])
+            np.cumsum(arr, axis=0, out=cumsum[1:])
+            return cumsum[last] - cumsum[first]
+
+        spectra = window_sum(spectrogram)
+        spectra_var = window_sum(variance)
+        duration = window_sum(np.asarray(self.timedel, dtype=np.float64))
+        result = {
+            'time_edges': np.column_stack((starts, ends)) + self.T0_unix,
+            'rows': np.column_stack((first, last)),
+            'duration': duration,
+        }
+        result.update(
+            get_band_sums(spectra, spectra_var, self.ebins_low,
+                          self.ebins_high, energy_bands))
+        return result
+
+    def get_band_light_curves(self,
+                              energy_bands,
+                              detector_slice=slice(None, None),
+                              pixel_slice=slice(None, None),
+                              dead_time_correction=False,
+                              rates=True):
+        """
+        Light curves in arbitrary energy bands.
+        Band edges are mapped to science energy channels once, and all bands are summed with a single np.add.reduceat
+
+        Arguments:
+        energy_bands: list
+            energy band edges in keV, e.g. [4, 10, 15, 25, 50, 84]
+        detector_slice: slice, index or boolean array
+            detectors to be included
+        pixel_slice: slice, index or boolean array
+            pixels to be included
+        dead_time_correction: bool
+            use dead time corrected counts
+        rates: bool
+            return count rates instead of counts
+        Returns:
+            result: dict
+                light_curves, light_curves_err: T x B arrays
+                energy_bands: low and high edges of the bands in keV
+        """
+        spectrogram, variance = self._reduced_spectrogram(
+            detector_slice, pixel_slice, dead_time_correction)
+        result = get_band_sums(spectrogram, variance, self.ebins_low,
+                               self.ebins_high, energy_bands)
+        del result['spectra'], result['spectra_err']
+        if rates:
+            timedel = np.asarray(self.timedel, dtype=np.float64)[:, None]
+            result['light_curves'] = result['light_curves'] / timedel
+            result['light_curves_err'] = result['light_curves_err'] / timedel
+        return result
+
     def get_mean_rate(self,start_utc =None, end_utc=None):
         """
         Calculate the mean count rate in different regions of a pixel data file within a specified time range.
@@ -541,9 +1405,6 @@ class PixelData(ScienceData):
             return None
         if isinstance(plots, str) and plots:
             plots = plots.split(',')
-        if not self.data_loaded:
-            self.read_fits()
-            self.data_loaded = True
 
         if 'spg' in plots:
             if not ax0:
@@ -568,24 +1429,14 @@ class PixelData(ScienceData):
         if 'lc' in plots or 'qllc' in plots:
             if not ax1:
                 _, ax1 = plt.subplots()
-            self.count_rate_spectrogram = self.spectrogram / self.timedel[:,
-                                                                          None]
             if 'qllc' in plots:
-                ql_ebins = [(4, 10), (10, 15), (15, 25), (25, 50), (50, 84)]
-                labels = ('4 - 10 keV', '10 - 15 keV', '15 - 25 keV',
-                          '25 - 50 keV', '50 - 84 keV')
-                ql_sci_ebins = [
-                    self.get_energy_range_slicer(s[0], s[1]) for s in ql_ebins
-                ]
-                for ebin_slicer, label in zip(ql_sci_ebins, labels):
-                    ax1.plot(self.time,
-                             np.sum(self.count_rate_spectrogram[:,
-                                                                ebin_slicer],
-                                    axis=1),
-                             label=label)
-                    ax1.set_title(
-                        f'Detector summed count rates (L1 request #{self.request_id})'
-                    )
+                lcs = self.get_band_light_curves([4, 10, 15, 25, 50, 84])
+                for lc, (elow, ehigh) in zip(lcs['light_curves'].T,
+                                             lcs['energy_bands']):
+                    ax1.plot(self.time, lc, label=f'{elow:g} - {ehigh:g} keV')
+                ax1.set_title(
+                    f'Detector summed count rates (L1 request #{self.request_id})'
+                )
             else:
                 ax1.plot(
                     self.time,
@@ -620,44 +1471,163 @@ class PixelData(ScienceData):
 
 class BackgroundSubtraction(object):
 
-    def __init__(self, l1sig: PixelData, l1bkg: PixelData):
+    def __init__(self, l1sig: PixelData, l1bkg: PixelData, reduced_only=False):
         """
                    do background subtraction
                 Arguments
                 l1sig: a L1product instance containing the signal
-                l1bkg: a L1Product instance containing the background
+                l1bkg: a L1Product instance containing the background, or a BackgroundModel
+                reduced_only: bool
+                    only compute products reduced over time, detectors or pixels.
+                    Background-subtracted count cubes (T x 32 x 12 x 32) are then not available
 
                 """
         self.l1sig = l1sig
         self.l1bkg = l1bkg
+        self.reduced_only = reduced_only
+        self.bkg_model = l1bkg if isinstance(
+            l1bkg, BackgroundModel) else BackgroundModel.from_pixel_data(l1bkg)
         #print(self.l1sig.energy_bin_mask)
 
-        dmask = self.l1bkg.energy_bin_mask - self.l1sig.energy_bin_mask
+        dmask = self.bkg_model.energy_bin_mask - np.ravel(
+            self.l1sig.energy_bin_mask)
         if np.any(dmask < 0):
-            ValueError('Inconsistent energy bins')
-            return
+            raise ValueError('Inconsistent energy bins')
+
+        self.energy_bin_mask = np.ravel(self.l1sig.energy_bin_mask)
+        self.inversed_energy_bin_mask = np.ravel(
+            self.l1sig.inversed_energy_bin_mask)
+        # background rates and errors per detector, pixel and energy, 32 x 12 x 32
+        self.bkg_rates = self.bkg_model.mean_pixel_rate_spectra
+        self.bkg_rates_err = self.bkg_model.mean_pixel_rate_spectra_err
+        self.timedel = np.asarray(self.l1sig.timedel, dtype=np.float64)
+
+    def _check_cube_allowed(self, name):
+        if self.reduced_only:
+            raise ValueError(
+                f'{name} is not available when reduced_only is True')
 
-        # mean_pixel_rate_clip = self.l1bkg.mean_pixel_rate_spectra * self.l1sig.inversed_energy_bin_mask
+    @cached_property
+    def pixel_bkg_counts(self):
+        self._check_cube_allowed('pixel_bkg_counts')
+        return self.timedel[:, None, None, None] * self.bkg_rates
 
-        self.pixel_bkg_counts = np.array([
-            int_time * self.l1bkg.mean_pixel_rate_spectra
-            for int_time in self.l1sig.timedel
-        ])
+    @cached_property
+    def subtracted_counts(self):
+        self._check_cube_allowed('subtracted_counts')
         # set counts beyond the signal energy range to 0
-        self.subtracted_counts = (self.l1sig.counts - self.pixel_bkg_counts)
-        self.subtracted_counts *= self.l1sig.energy_bin_mask
-
+        subtracted = np.multiply(self.timedel[:, None, None, None],
+                                 self.bkg_rates)
+        np.subtract(self.l1sig.counts, subtracted, out=subtracted)
+        subtracted *= self.energy_bin_mask
+        return subtracted
+
+    @cached_property
+    def subtracted_counts_err(self):
+        self._check_cube_allowed('subtracted_counts_err')
         # Dead time correction needs to be included in the future
-        self.subtracted_counts_err = np.sqrt(
-            self.l1sig.counts + np.array([int_time * self.l1bkg.mean_pixel_rate_spectra_err ** 2 for int_time in self.l1sig.timedel])) * \
-            self.l1sig.inversed_energy_bin_mask
-        self.bkg_subtracted_spectrogram = np.sum(self.subtracted_counts,
-                                                 axis=(1, 2))
+        err = np.multiply(self.timedel[:, None, None, None],
+                          self.bkg_rates_err**2)
+        err += self.l1sig.counts
+        np.sqrt(err, out=err)
+        err *= self.inversed_energy_bin_mask
+        return err
+
+    @cached_property
+    def bkg_subtracted_spectrogram(self):
+        bkg_spectrum = np.sum(self.bkg_rates, axis=(0, 1))
+        return (self.l1sig.spectrogram - self.timedel[:, None] *
+                bkg_spectrum) * self.energy_bin_mask
+
+    def get_window_spectra(self,
+                           windows=None,
+                           window=None,
+                           step=None,
+                           energy_bands=None,
+                           detector_slice=slice(None, None),
+                           pixel_slice=slice(None, None)):
+        """
+        Background-subtracted spectra and light curves for many time windows in one pass.
+        Arguments are the same as PixelData.get_window_spectra; spectra and light curves are
+        background-subtracted counts in the windows.
+        """
+        sig = self.l1sig
+        spectrogram = np.sum(np.asarray(sig.counts)[:, detector_slice][:, :,
+                                                                       pixel_slice],
+                             axis=(1, 2))
+        result = sig._window_sums(spectrogram, spectrogram, windows, window,
+                                  step, None)
+        bkg_spectrum = np.sum(self.bkg_rates[detector_slice, pixel_slice],
+                              axis=(0, 1))
+        bkg_var = np.sum(self.bkg_rates_err[detector_slice, pixel_slice]**2,
+                         axis=(0, 1))
+        duration = result['duration'][:, None]
+        spectra = (result['spectra'] -
+                   duration * bkg_spectrum) * self.energy_bin_mask
+        spectra_var = (result['spectra_err']**2 +
+                       duration * bkg_var) * self.inversed_energy_bin_mask
+        result.update(
+            get_band_sums(spectra, spectra_var, sig.ebins_low, sig.ebins_high,
+                          energy_bands))
+        return result
+
+    def to_store(self, path, chunk_size=256, compress=False, overwrite=False):
+        """
+            Save background subtraction results to a time-chunked array store,
+            which can be loaded with stixdcpy.store.load
+        Args
+            path: str
+                store folder
+            chunk_size: int
+                number of time bins per chunk
+            compress: bool
+                compress the chunks. Uncompressed chunks are memory-mapped when loaded
+            overwrite: bool
+                replace an existing store at path
+        Returns
+            stixdcpy.store.ArrayStore
+        """
+        time_arrays = {
+            'time': self.l1sig.time,
+            'timedel': self.timedel,
+            'bkg_subtracted_spectrogram': self.bkg_subtracted_spectrogram,
+        }
+        if not self.reduced_only:
+            time_arrays['subtracted_counts'] = self.subtracted_counts
+            time_arrays['subtracted_counts_err'] = self.subtracted_counts_err
+        arrays = dict(time_arrays,
+                      bkg_rates=self.bkg_rates,
+                      bkg_rates_err=self.bkg_rates_err,
+                      energy_bin_mask=self.energy_bin_mask,
+                      ebins_low=np.asarray(self.l1sig.ebins_low),
+                      ebins_high=np.asarray(self.l1sig.ebins_high))
+        meta = {
+            'data_type': 'BackgroundSubtraction',
+            'fname': str(self.l1sig.fname),
+            'bkg_fname': str(self.bkg_model.fname),
+            'T0_utc': self.l1sig.T0_utc,
+            'T0_unix': self.l1sig.T0_unix,
+            'duration': self.l1sig.duration,
+        }
+        return sst.ArrayStore.write(path,
+                                    arrays,
+                                    meta,
+                                    time_arrays=list(time_arrays),
+                                    detector_axes={
+                                        'subtracted_counts': 1,
+                                        'subtracted_counts_err': 1,
+                                        'bkg_rates': 0,
+                                        'bkg_rates_err': 0
+                                    },
+                                    chunk_size=chunk_size,
+                                    compress=compress,
+                                    overwrite=overwrite)
 
     def peek(self):
         fig, axs = plt.subplots(2, 2)
         self.l1sig.peek(ax0=axs[0, 0])
-        self.l1bkg.peek(ax0=axs[0, 1])
+        if isinstance(self.l1bkg, PixelData):
+            self.l1bkg.peek(ax0=axs[0, 1])
         X, Y = np.meshgrid(self.l1sig.time,
                            np.arange(self.l1sig.min_ebin, self.l1sig.max_ebin))
         im = axs[1, 0].pcolormesh(
@@ -675,14 +1645,14 @@ class BackgroundSubtraction(object):
         cbar.set_label('Counts')
         axs[1, 0].set_title('Bkg sub. counts')
         axs[1, 0].set_ylabel('Energy range(keV')
-        axs[1, 0].set_xlabel(f"Seconds since {self.l1sig.T0}s ")
+        axs[1, 0].set_xlabel(f"Seconds since {self.l1sig.T0_utc} ")
         axs[1, 1].plot(np.sum(self.l1sig.spectrogram, axis=0),
                        drawstyle='steps-mid',
                        label='Before subtraction')
         axs[1, 1].plot(np.sum(self.bkg_subtracted_spectrogram, axis=0),
                        drawstyle="steps-mid",
                        label='After subtraction')
-        axs[1, 1].plot(np.sum(self.pixel_bkg_counts, axis=(0, 1, 2)),
+        axs[1, 1].plot(np.sum(self.timedel) * np.sum(self.bkg_rates, axis=(0, 1)),
                        drawstyle="steps-mid",
                        label='background')
         axs[1, 1].legend()
@@ -732,28 +1702,255 @@ class BackgroundSubtraction(object):
         time_span=self.l1sig.time[end_i_tbin] - self.l1sig.time[
                 start_i_tbin] + 0.5 * self.l1sig.timedel[
                     start_i_tbin] + 0.5 * self.l1sig.timedel[end_i_tbin]
-        bkg_sub_spectra = np.sum(self.subtracted_counts[start_i_tbin: end_i_tbin,
-                                                        detector_slice, pixel_slice, : ],
-            axis=(0, 1, 2)) / time_span
-        
-        bkg_sub_spectra_err = np.sqrt(np.sum(self.subtracted_counts_err[start_i_tbin:end_i_tbin, detector_slice, pixel_slice, :]
-                   ** 2, axis=(0, 1, 2))) / time_span
-        
-        return bkg_sub_spectra, bkg_sub_spectra_err                
+        # sums are taken over the signal counts and the background rates separately,
+        # which avoids creating background-subtracted count cubes
+        sig_counts = np.sum(self.l1sig.counts[start_i_tbin:end_i_tbin,
+                                              detector_slice, pixel_slice, :],
+                            axis=(0, 1, 2))
+        integration_time = np.sum(self.timedel[start_i_tbin:end_i_tbin])
+        bkg_counts = integration_time * np.sum(
+            self.bkg_rates[detector_slice, pixel_slice, :], axis=(0, 1))
+        bkg_counts_var = integration_time * np.sum(
+            self.bkg_rates_err[detector_slice, pixel_slice, :]**2, axis=(0, 1))
+
+        bkg_sub_spectra = (sig_counts -
+                           bkg_counts) * self.energy_bin_mask / time_span
+
+        bkg_sub_spectra_err = np.sqrt(
+            (sig_counts + bkg_counts_var) *
+            self.inversed_energy_bin_mask) / time_span
+
+        return bkg_sub_spectra, bkg_sub_spectra_err
+
+
+class BackgroundModel(object):
+    """
+        Background model derived from a background pixel data file.
+        It holds the reduced background rates, so that it can be applied to many signal files
+        without reopening the background FITS file
+    """
+    _cache = {}
+    # models in memory, keyed by background file checksum
+    _checksums = {}
+    # checksums of background files, keyed by (path, size, modification time)
+
+    def __init__(self,
+                 mean_pixel_rate_spectra,
+                 mean_pixel_rate_spectra_err,
+                 energy_bin_mask,
+                 duration,
+                 live_ratio=None,
+                 fname=None,
+                 checksum=None):
+        """
+        Arguments:
+        mean_pixel_rate_spectra: np.ndarray
+            background count rates, 32 x 12 x 32 (detector, pixel, energy)
+        mean_pixel_rate_spectra_err: np.ndarray
+            errors of the background count rates
+        energy_bin_mask: np.ndarray
+            energy bin mask of the background data
+        duration: float
+            duration of the background observation in units of seconds
+        live_ratio: np.ndarray
+            mean live time ratio of each detector during the background observation
+        fname: str
+            background FITS filename
+        checksum: str
+            md5 checksum of the background FITS file
+        """
+        self.mean_pixel_rate_spectra = np.asarray(mean_pixel_rate_spectra)
+        self.mean_pixel_rate_spectra_err = np.asarray(
+            mean_pixel_rate_spectra_err)
+        self.energy_bin_mask = np.ravel(energy_bin_mask)
+        self.inversed_energy_bin_mask = 1 - self.energy_bin_mask
+        self.duration = float(duration)
+        self.live_ratio = None if live_ratio is None else np.asarray(
+            live_ratio)
+        self.fname = None if fname is None else str(fname)
+        self.checksum = checksum
+
+    @classmethod
+    def from_pixel_data(cls, l1bkg: PixelData):
+        """
+            create a background model from a loaded PixelData object
+        """
+        live_ratio = None
+        if l1bkg.triggers is not None:
+            live_ratio = np.mean(compute_live_ratio(l1bkg.triggers,
+                                                    l1bkg.timedel),
+                                 axis=0)
+        return cls(l1bkg.mean_pixel_rate_spectra,
+                   l1bkg.mean_pixel_rate_spectra_err,
+                   l1bkg.energy_bin_mask,
+                   l1bkg.duration,
+                   live_ratio=live_ratio,
+                   fname=l1bkg.fname)
+
+    @classmethod
+    def from_fits(cls, fname, cache_dir=None):
+        """
+            Create a background model from a background pixel data FITS file.
+            Models are cached by file checksum in memory and, if cache_dir is given, on disk.
+            The checksum is only computed again if the path, size or modification time of the file changed
+        Arguments:
+        fname: str
+            background FITS filename
+        cache_dir: str or None
+            folder where models are stored
+        Returns:
+            BackgroundModel
+        """
+        stat = os.stat(fname)
+        stat_key = (os.path.realpath(fname), stat.st_size, stat.st_mtime_ns)
+        checksum = cls._checksums.get(stat_key)
+        if checksum is None:
+            checksum = utils.fits_checksum(fname)
+            cls._checksums[stat_key] = checksum
+        if checksum in cls._cache:
+            return cls._cache[checksum]
+        cache_file = Path(cache_dir, f'{checksum}.npz') if cache_dir else None
+        if cache_file and cache_file.is_file():
+            model = cls.load(cache_file)
+        else:
+            with PixelData(fname, None) as l1bkg:
+                model = cls.from_pixel_data(l1bkg)
+            model.checksum = checksum
+            if cache_file:
+                Path(cache_dir).mkdir(parents=True, exist_ok=True)
+                model.save(cache_file)
+        cls._cache[checksum] = model
+        return model
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+        cls._checksums.clear()
+
+    def save(self, filename):
+        """
+            save the model to a compressed npz file
+        """
+        arrays = {
+            'mean_pixel_rate_spectra': self.mean_pixel_rate_spectra,
+            'mean_pixel_rate_spectra_err': self.mean_pixel_rate_spectra_err,
+            'energy_bin_mask': self.energy_bin_mask,
+            'duration': self.duration,
+            'fname': str(self.fname or ''),
+            'checksum': str(self.checksum or '')
+        }
+        if self.live_ratio is not None:
+            arrays['live_ratio'] = self.live_ratio
+        with open(filename, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        return filename
+
+    @classmethod
+    def load(cls, filename):
+        """
+            load a model saved by BackgroundModel.save
+        """
+        with np.load(filename) as data:
+            return cls(data['mean_pixel_rate_spectra'],
+                       data['mean_pixel_rate_spectra_err'],
+                       data['energy_bin_mask'],
+                       data['duration'],
+                       live_ratio=data['live_ratio']
+                       if 'live_ratio' in data.files else None,
+                       fname=str(data['fname']) or None,
+                       checksum=str(data['checksum']) or None)
+
+    def subtract(self, l1sig: PixelData, reduced_only=False):
+        """
+            subtract the background from signal pixel data
+        Returns:
+            BackgroundSubtraction
+        """
+        return BackgroundSubtraction(l1sig, self, reduced_only=reduced_only)
+
+    def apply(self, signal_files, start_utc=None, end_utc=None, n_jobs=1):
+        """
+            Compute background-subtracted spectra of many signal files in parallel
+        Arguments:
+        signal_files: list
+            signal pixel data FITS filenames
+        start_utc, end_utc:  str or None
+            time range of the spectra, the whole file is used if not given
+        n_jobs: int
+            number of parallel jobs, see joblib.Parallel
+        Returns:
+            a list of (bkg_sub_spectra, bkg_sub_spectra_err) tuples, one for each file
+        """
+        return joblib.Parallel(n_jobs=n_jobs)(
+            joblib.delayed(_subtract_background)(self, fname, start_utc,
+                                                 end_utc)
+            for fname in signal_files)
+
+
+def _subtract_background(model, fname, start_utc, end_utc):
+    with PixelData(fname, None) as l1sig:
+        bkg_sub = model.subtract(l1sig, reduced_only=True)
+        return bkg_sub.get_background_subtracted_spectrum(start_utc, end_utc)
 
 
 class Spectrogram(ScienceData):
 
-    def __init__(self, fname, request_id, ltc=False):
-        super().__init__(fname, request_id)
+    def __init__(self, fname, request_id, ltc=False, **kwargs):
+        super().__init__(fname, request_id, **kwargs)
         self.data_type = 'Spectrogram'
         self.read_fits(light_time_correction=ltc)
-        self.spectrum = np.sum(self.counts, axis=0)
 
-    @property
+    @cached_property
+    def count_rates(self):
+        return self.native('counts') / self.timedel[:, None]
+
+    @cached_property
+    def spectrum(self):
+        return np.sum(self.native('counts'), axis=0)
+
+    @cached_property
     def counts_error(self):
-        return error_computation(self.hdul['data'].data['counts_comp_err'],
-                                 self.counts)
+        return self._combined_error('counts_error', ('counts_comp_err', ),
+                                    self.native('counts'))
+
+    def get_rcr_segment_spectra(self,
+                                energy_bands=None,
+                                dead_time_correction=False,
+                                attenuator_transmission=None):
+        """
+        Spectra and energy-band counts of each rate control regime (RCR) segment, computed in one pass
+
+        Arguments:
+        energy_bands: list or None
+            energy band edges in keV. All energy channels are summed if not given
+        dead_time_correction: bool
+            use dead time corrected counts
+        attenuator_transmission: array-like or None
+            transmission of the attenuator in each energy channel.
+            If given, the spectra of the segments with the attenuator inserted are divided by it
+        Returns:
+            result: dict
+                rcr_segments entries, and spectra, spectra_err, light_curves, light_curves_err and energy_bands,
+                with one row per segment
+        """
+        spectrogram = np.asarray(self.counts, dtype=np.float64)
+        counts_err = np.asarray(self.counts_error, dtype=np.float64)
+        if dead_time_correction:
+            cl1 = self.corrected if self.corrected is not None else self.correct_dead_time()
+            live_ratio = cl1['live_ratio'][:, None]
+            spectrogram = spectrogram / live_ratio
+            counts_err = counts_err / live_ratio
+        return get_segment_spectra(self, spectrogram, np.square(counts_err),
+                                   energy_bands, attenuator_transmission)
+
+    def _store_arrays(self):
+        arrays, detector_axes = super()._store_arrays()
+        arrays['counts_err'] = self.counts_error
+        if self.corrected is not None:
+            for key in ('corrected_rate', 'photons_in', 'live_ratio',
+                        'live_error'):
+                arrays[key] = self.corrected.get(key)
+        return arrays, detector_axes
 
     def peek(self, ax0=None, ax1=None, ax2=None, ax3=None):
         """
@@ -782,13 +1979,13 @@ class Spectrogram(ScienceData):
             cbar.set_label('Counts')
             ax0.set_title('Spectrogram')
             ax0.set_ylabel('Energy range(keV')
-            ax0.set_xlabel(f"Seconds since {self.T0}s ")
+            ax0.set_xlabel(f"Seconds since {self.T0_utc} ")
         if ax1:
             # convert to 2d
             ax1.plot(self.time, self.count_rates)
             ax1.set_yscale('log')
             ax1.set_ylabel('Counts / sec')
-            ax1.set_xlabel(f"Seconds since {self.T0}s ")
+            ax1.set_xlabel(f"Seconds since {self.T0_utc} ")
         if ax2:
             ax2.plot(self.ebins_low, self.spectrum, drawstyle='steps-post')
             ax2.set_xscale('log')
@@ -797,14 +1994,20 @@ class Spectrogram(ScienceData):
             ax2.set_ylabel('Counts')
         if ax3:
             ax3.plot(self.time, self.timedel)
-            ax3.set_xlabel(f"Seconds since {self.T0}s ")
+            ax3.set_xlabel(f"Seconds since {self.T0_utc} ")
             ax3.set_ylabel('Integration time (sec)')
         plt.suptitle(f'L4 request #{self.request_id}')
         plt.tight_layout()
         return fig, ((ax0, ax1), (ax2, ax3))
 
-    def correct_dead_time(self) -> dict:
+    def correct_dead_time(self, error_method='bounds') -> dict:
         """ dead time correction
+        Arguments:
+            error_method: str
+                'bounds': live_error is half the difference of the live ratios computed
+                    from triggers + trigger_error and triggers - trigger_error, like Ewan does;
+                'derivative': live_error is propagated from trigger_error using the analytic
+                    derivative of the live ratio with respect to triggers
             returns dict, where
                 count_rate --> counts / timedel
                 corrected_rate --> count_rate / live_time_ratios
@@ -812,49 +2015,324 @@ class Spectrogram(ScienceData):
                 live_ratio --> livetime at each time bin
                 live_error --> estimate of error on live_ratio
         """
-
-        def correct(triggers, counts_arr, time_bins, num_detectors):
-            ''' correct dead time using triggers '''
-            tau_conv_const = 1e-6
-            photons_in = triggers / (time_bins * num_detectors -
-                                     TRIG_TAU * triggers)
-            # photon rate approximated using triggers
-
-            count_rate = counts_arr / time_bins[:, None]
-            nin = photons_in
-
-            live_ratio = np.exp(-BETA * nin * ASIC_TAU * tau_conv_const)
-            live_ratio /= (1 + nin * TRIG_TAU)
-            corrected_rate = count_rate / live_ratio[:, None]
-            return {
-                'corrected_rate': corrected_rate,
-                'count_rate': count_rate,
-                'photons_in': photons_in,
-                'live_ratio': live_ratio
-            }
+        if error_method not in ('bounds', 'derivative'):
+            raise ValueError(f'Unknown error method: {error_method}')
+        tau_conv_const = 1e-6
+        asic_tau = BETA * ASIC_TAU * tau_conv_const
 
         try:
             num_detectors = self.hdul[1].data['detector_masks'].sum()
         except KeyError:
             num_detectors = self.hdul[1].data['detector_mask'].sum()
 
-        self.corrected = correct(self.triggers, self.counts,  self.timedel,
-                                 num_detectors)
-
-        # approximate the live ratio error like Ewan does
-        above = correct(self.triggers + self.trigger_error, self.counts,
-                        self.timedel, num_detectors)
-        below = correct(self.triggers - self.trigger_error, self.counts,
-                        self.timedel, num_detectors)
-        self.corrected['live_error'] = np.abs(above['live_ratio'] -
-                                              below['live_ratio']) / 2
+        cached = rcache.lookup(self, 'Spectrogram.correct_dead_time',
+                               error_method=error_method)
+        if cached is not None:
+            self.corrected = cached
+            return self.corrected
+
+        triggers = np.asarray(self.triggers, dtype=np.float64)
+        trigger_error = np.asarray(self.trigger_error, dtype=np.float64)
+        exposure = self.timedel * num_detectors
+        if error_method == 'bounds':
+            # nominal, upper and lower triggers in one pass
+            triggers = np.stack(
+                (triggers, triggers + trigger_error, triggers - trigger_error))
+        # photon rate approximated using triggers
+        photons_in = triggers / (exposure - TRIG_TAU * triggers)
+        live_ratio = np.exp(-asic_tau * photons_in) / (1 + photons_in * TRIG_TAU)
+
+        if error_method == 'bounds':
+            live_error = np.abs(live_ratio[1] - live_ratio[2]) / 2
+            photons_in, live_ratio = photons_in[0], live_ratio[0]
+        else:
+            dlive_dnin = -live_ratio * (asic_tau + TRIG_TAU /
+                                        (1 + photons_in * TRIG_TAU))
+            dnin_dtrig = exposure / (exposure - TRIG_TAU * triggers)**2
+            live_error = np.abs(dlive_dnin * dnin_dtrig) * trigger_error
+
+        count_rate = self.native('counts') / self.timedel[:, None]
+        self.corrected = {
+            'corrected_rate': count_rate / live_ratio[:, None],
+            'count_rate': count_rate,
+            'photons_in': photons_in,
+            'live_ratio': live_ratio,
+            'live_error': live_error
+        }
+        rcache.store(self, 'Spectrogram.correct_dead_time', self.corrected,
+                     error_method=error_method)
 
         return self.corrected
 
 
+class RebinnedData(object):
+    """
+        Energy and time rebinned science data, returned by ScienceData.rebin
+    """
+
+    def __init__(self, **kwargs):
+        self.data_type = None
+        self.T0_utc = None
+        self.T0_unix = None
+        self.time = None
+        self.timedel = None
+        self.time_shift_applied = 0
+        self.counts = None
+        self.counts_err = None
+        self.triggers = None
+        self.triggers_err = None
+        self.rcr = None
+        self.ebins_low = None
+        self.ebins_high = None
+        self.__dict__.update(kwargs)
+
+    @property
+    def unix_time(self):
+        return self.T0_unix + self.time + 0.5 * self.timedel + self.time_shift_applied
+
+    @property
+    def datetime64(self):
+        return sdt.unix2datetime64(self.unix_time)
+
+    @property
+    def energy_bin_names(self):
+        return [f'{a} - {b}' for a, b in zip(self.ebins_low, self.ebins_high)]
+
+    @property
+    def count_rates(self):
+        return self.counts / self.timedel.reshape(
+            (-1, ) + (1, ) * (self.counts.ndim - 1))
+
+    @property
+    def count_rates_err(self):
+        return self.counts_err / self.timedel.reshape(
+            (-1, ) + (1, ) * (self.counts_err.ndim - 1))
+
+
+def get_energy_bin_starts(ebins_low, ebins):
+    """
+        Map energy bin edges in keV to science energy channels
+    Args
+        ebins_low: array-like
+            lower edges of the science energy channels
+        ebins: array-like
+            energy bin edges in keV
+    Returns
+        starts: np.ndarray
+            index of the first science channel of each energy bin
+        stop: int
+            index after the last science channel of the last energy bin
+    """
+    edges = np.unique(
+        np.searchsorted(np.asarray(ebins_low), np.asarray(ebins, dtype=float)))
+    edges = edges[edges <= len(ebins_low)]
+    if edges.size < 2:
+        raise ValueError(f'Invalid energy bins: {ebins}')
+    return edges[:-1], int(edges[-1])
+
+
+def get_band_sums(spectra, spectra_var, ebins_low, ebins_high,
+                  energy_bands=None):
+    """
+        Sum spectra over energy bands
+    Args
+        spectra: np.ndarray
+            spectra, energy is the last axis
+        spectra_var: np.ndarray
+            variances of the spectra
+        ebins_low, ebins_high: array-like
+            science energy channel edges
+        energy_bands: list or None
+            energy band edges in keV. All channels are summed if not given
+    Returns
+        dict with spectra, spectra_err, light_curves, light_curves_err and energy_bands
+    """
+    if energy_bands is None:
+        energy_bands = [ebins_low[0], ebins_high[-1]]
+    e_starts, e_stop = get_energy_bin_starts(ebins_low, energy_bands)
+    e_stops = np.append(e_starts[1:], e_stop)
+    return {
+        'spectra': spectra,
+        'spectra_err': np.sqrt(spectra_var),
+        'light_curves': np.add.reduceat(spectra[..., :e_stop], e_starts,
+                                        axis=-1),
+        'light_curves_err': np.sqrt(
+            np.add.reduceat(spectra_var[..., :e_stop], e_starts, axis=-1)),
+        'energy_bands': np.column_stack((np.asarray(ebins_low)[e_starts],
+                                         np.asarray(ebins_high)[e_stops - 1])),
+    }
+
+
+def get_segment_spectra(sci,
+                        spectrogram,
+                        variance,
+                        energy_bands=None,
+                        attenuator_transmission=None):
+    """
+        Sum a spectrogram over the rate control regime (RCR) segments of science data
+    Args
+        sci: ScienceData
+        spectrogram, variance: np.ndarray
+            spectrogram and its variance, one row per time bin
+        energy_bands: list or None
+            energy band edges in keV
+        attenuator_transmission: array-like or None
+            transmission of the attenuator in each energy channel, applied to the segments with the attenuator inserted
+    Returns
+        dict with the rcr_segments entries and the band sums of the segments
+    """
+    segments = sci.rcr_segments
+    spectra = reduction.segment_sums(spectrogram, segments['start'])
+    spectra_var = reduction.segment_sums(variance, segments['start'])
+    if attenuator_transmission is not None:
+        factor = np.where(segments['attenuator_in'][:, None],
+                          np.asarray(attenuator_transmission, dtype=np.float64),
+                          1.)
+        spectra = spectra / factor
+        spectra_var = spectra_var / factor**2
+    result = dict(segments)
+    result.update(
+        get_band_sums(spectra, spectra_var, sci.ebins_low, sci.ebins_high,
+                      energy_bands))
+    return result
+
+
+def get_time_windows(sci, windows=None, window=None, step=None):
+    """
+        Get start and end times of time windows, relative to T0
+    Args
+        sci: ScienceData
+        windows: list of (start_utc, end_utc) tuples or None
+        window: float
+            window length in units of seconds, used if windows is not given.
+            Windows of this length are placed over the whole data time range
+        step: float
+            step between window starts, default: window
+    Returns
+        starts, ends: np.ndarray
+    """
+    if windows is not None:
+        edges = sdt.utc2unix_array(windows).reshape(-1, 2) - sci.T0_unix
+        return edges[:, 0], edges[:, 1]
+    if not window or window <= 0:
+        raise ValueError('Either windows or a positive window length must be given')
+    step = step or window
+    data_start = sci.time[0] - 0.5 * sci.timedel[0]
+    data_end = sci.time[-1] + 0.5 * sci.timedel[-1]
+    num = max(1, int(np.floor((data_end - data_start - window) / step + 1e-9)) + 1)
+    starts = data_start + step * np.arange(num)
+    return starts, starts + window
+
+
+def get_window_rows(time, timedel, starts, ends):
+    """
+        Get the time bins overlapping with time windows
+    Returns
+        first, last: np.ndarray
+            index of the first time bin and the index after the last time bin of each window
+    """
+    first = np.searchsorted(time + 0.5 * timedel, starts, side='right')
+    last = np.searchsorted(time - 0.5 * timedel, ends, side='left')
+    return first, np.maximum(first, last)
+
+
+def get_time_bin_starts(timedel, min_tbin, rcr=None):
+    """
+        Get the indices of the first time bins of merged time bins.
+        Consecutive time bins are merged until the merged bin is at least min_tbin long;
+        bins are not merged across rcr changes
+    Args
+        timedel: np.ndarray
+            integration time of the time bins
+        min_tbin: float
+            minimum time bin in units of seconds
+        rcr: np.ndarray or None
+            rate control regime states
+    Returns
+        starts: np.ndarray
+            indices of the first time bins of merged time bins
+    """
+    num = len(timedel)
+    if not min_tbin or min_tbin <= 0 or num < 2:
+        return np.arange(num)
+    bin_end = np.cumsum(timedel, dtype=np.float64)
+    rcr_changes = np.flatnonzero(np.diff(rcr)) + 1 if (
+        rcr is not None and len(rcr) == num) else np.array([], dtype=int)
+    starts = []
+    i = 0
+    # one binary search per merged bin
+    while i < num:
+        starts.append(i)
+        bin_start = bin_end[i - 1] if i > 0 else 0.
+        stop = int(np.searchsorted(bin_end, bin_start + min_tbin)) + 1
+        k = np.searchsorted(rcr_changes, i, side='right')
+        if k < rcr_changes.size:
+            stop = min(stop, rcr_changes[k])
+        i = stop
+    return np.array(starts)
+
+
+def compute_live_ratio(triggers, timedel):
+    """
+        Compute live time ratios of detectors from pixel data triggers
+    Args
+        triggers: np.ndarray
+            triggers, T x 16
+        timedel: np.ndarray
+            integration time of the time bins
+    Returns
+        live_ratio: np.ndarray
+            live time ratio of each detector, T x 32
+    """
+    photons_in = triggers / (timedel[:, None] - TRIG_TAU * triggers)
+    nin = photons_in[:, TRIGGER_INDEX_OF_DETECTORS]
+    return np.exp(-BETA * nin * ASIC_TAU) / (1 + nin * TRIG_TAU)
+
+
+def to_native(arr):
+    """
+        Contiguous native-endian version of an array; the array itself if it is already one
+    Args
+        arr: np.ndarray, None or any other array-like object
+    Returns
+        np.ndarray, or arr if it is not a numpy array
+    """
+    if not isinstance(arr, np.ndarray):
+        return arr
+    if arr.dtype.isnative and arr.flags.c_contiguous:
+        return arr
+    return np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('='))
+
+
+def compact_array(arr):
+    """
+        Convert an array to a compact native-endian dtype: uint32 for non-negative integers which fit in it,
+        float32 for floating point numbers. Other arrays are only converted to native byte order
+    Args
+        arr: np.ndarray or None
+    Returns
+        np.ndarray or None
+    """
+    if arr is None:
+        return None
+    arr = np.asarray(arr)
+    if arr.dtype.kind in 'iu' and (arr.size == 0 or
+                                   (arr.min() >= 0 and
+                                    arr.max() <= np.iinfo(np.uint32).max)):
+        return arr.astype(np.uint32)
+    if arr.dtype.kind == 'f':
+        return arr.astype(np.float32)
+    return arr.astype(arr.dtype.newbyteorder('='), copy=False)
+
+
 def error_computation(given_error: np.ndarray,
-                      quantity: np.ndarray) -> np.ndarray:
-    ''' combine the error from the FITS and Poisson as in IDL '''
+                      quantity: np.ndarray,
+                      dtype=None) -> np.ndarray:
+    ''' combine the error from the FITS and Poisson as in IDL.
+        The errors are computed in dtype (e.g. np.float32) if given '''
+    if dtype is not None:
+        given_error = np.asarray(given_error, dtype=dtype)
+        quantity = np.asarray(quantity, dtype=dtype)
     # try/except handles time bin shift
     try:
         return np.sqrt(given_error**2 + quantity)
@@ -862,7 +2340,7 @@ def error_computation(given_error: np.ndarray,
         return np.sqrt(given_error[1:]**2 + quantity)
 
 
-def fits_time_corrections(primary_header, tstart, tend):
+def fits_time_corrections(primary_header, tstart, tend, precision=3):
     """Calculates the correct values for the FITS header keywords that deal with times
 
     Inputs:
@@ -874,23 +2352,29 @@ def fits_time_corrections(primary_header, tstart, tend):
     tend : format recognizable by astropy.time.Time (for example, a string)
         End time of new FITS file
 
+    precision : int, default = 3
+        Number of decimal places of the seconds of the time keywords
+
     Returns:
     primary_header : astropy.io.fits.primary_HDU.header
             The modified header
     """
     creation_date = Time(dt.now()).isot
-    date_obs = Time(tstart).isot
+    date_obs = Time(tstart, precision=precision).isot
     date_beg = date_obs
-    date_end = Time(tend).isot
+    date_end = Time(tend, precision=precision).isot
     date_avg = Time(Time(tstart).mjd +
                     (Time(tend).mjd - Time(tstart).mjd) / 2.,
-                    format='mjd').isot  # average the date
+                    format='mjd',
+                    precision=precision).isot  # average the date
     dateref = date_obs
 
-    date_ear = Time(
-        Time(tstart).datetime + td(seconds=primary_header['EAR_TDEL'])).isot
-    date_sun = Time(
-        Time(tstart).datetime - td(seconds=primary_header['SUN_TIME'])).isot
+    date_ear = Time(Time(tstart).datetime +
+                    td(seconds=primary_header['EAR_TDEL']),
+                    precision=precision).isot
+    date_sun = Time(Time(tstart).datetime -
+                    td(seconds=primary_header['SUN_TIME']),
+                    precision=precision).isot
 
     # OBT_BEG =
     # OBT_END = #what are these?
@@ -941,14 +2425,15 @@ def fits_time_to_datetime(*args, factor=1):
 
     Returns:
         spectime: astropy.time.Time
+            start times of the time bins, in datetime format
     """
     if isinstance(args[0], str):
         primary_header, _, data, _ = open_spec_fits(args[0])
         data_table = data.data
     else:
         primary_header, data_table = args
-    time_bin_center = data_table['time']
-    duration = data_table['timedel']
+    time_bin_center = np.asarray(data_table['time'], dtype=np.float64)
+    duration = np.asarray(data_table['timedel'], dtype=np.float64)
     try:
         start_time = dt.strptime(primary_header['DATE_BEG'],
                              "%Y-%m-%dT%H:%M:%S.%f")
@@ -956,10 +2441,12 @@ def fits_time_to_datetime(*args, factor=1):
         start_time = dt.strptime(primary_header['DATE-BEG'],
                              "%Y-%m-%dT%H:%M:%S.%f")
 
-    spectime = Time([
-        start_time + td(seconds=bc / factor - d / (2. * factor))
-        for bc, d in zip(time_bin_center, duration)
-    ])
+    offsets_ns = np.round(
+        (time_bin_center / factor - duration / (2. * factor)) * 1e9)
+    spectime = Time(np.datetime64(start_time, 'ns') +
+                    offsets_ns.astype(np.int64).astype('timedelta64[ns]'))
+    # same format as a Time built from datetime objects
+    spectime.format = 'datetime'
     return spectime
 
 
@@ -1011,6 +2498,7 @@ def time_select_indices(tstart, tend, primary_header, data_table, factor=1.):
 def spec_fits_crop(fitsfile, tstart, tend, outfilename=None):
     """ Crop a STIX science data product (L1A, L1, or L4) to contain only the data within a given time interval. 
         Create a new FITS file containing this data. The new file will be of the same processing level as the input file.
+        For large files, spec_fits_crop_rows is faster as it only reads the rows in the time interval.
 
     Inputs:
     fitsfile : str
@@ -1078,6 +2566,7 @@ def spec_fits_concatenate(fitsfile1,
     """ Concatenate two STIX science data product (L1A, L1, or L4) files. Option to select only the 
         data within a given time interval. Create a new FITS file containing this data. The new file will be of the same processing level as the input file. 
         In case of overlapping time ranges, keep the data from the first file within this range (in an ideal case the data will anyway be identical)
+        Use spec_fits_concatenate_many to merge more than two files in one go.
 
     Inputs:
     fitsfile1 : str
@@ -1187,5 +2676,252 @@ def spec_fits_concatenate(fitsfile1,
     return outfilename
 
 
+def _spec_fits_start_time(primary_header):
+    try:
+        return primary_header['DATE-BEG']
+    except KeyError:
+        return primary_header['DATE_BEG']
 
-    
+
+def _set_spec_fits_times(primary_header, tstart, tend):
+    """
+        update the time keywords of a primary header, including the hyphenated L1 keywords.
+        tstart and tend are unix timestamps; the keywords are written with microsecond precision
+    """
+    tstart, tend = (Time(t, format='unix', precision=6) for t in (tstart, tend))
+    primary_header = fits_time_corrections(primary_header, tstart, tend,
+                                           precision=6)
+    for key in ('DATE-OBS', 'DATE-BEG', 'DATE-END', 'DATE-AVG'):
+        if key in primary_header:
+            primary_header[key] = primary_header[key.replace('-', '_')]
+    return primary_header
+
+
+def _spec_fits_bin_edges(hdul, factor=1):
+    """
+        unix start and end times of the time bins of a science data FITS file
+    """
+    data = hdul[2].data
+    t0 = sdt.utc2unix(_spec_fits_start_time(hdul[0].header))
+    time = np.asarray(data['time'], dtype=np.float64) / factor
+    timedel = np.asarray(data['timedel'], dtype=np.float64) / factor
+    starts = t0 + time - 0.5 * timedel
+    return t0, starts, starts + timedel
+
+
+def _write_spec_fits(outfilename, primary_header, control, data_hdu, energy,
+                     row_ranges, chunk_size=4096):
+    """
+        Write a science data FITS file, copying the raw rows of the data tables chunk by chunk.
+        Only the copied rows of memory-mapped inputs are read from disk
+    Args
+        outfilename: str
+            output filename
+        primary_header: astropy.io.fits.Header
+            primary header of the output file
+        control, energy: astropy.io.fits.BinTableHDU
+            CONTROL and ENERGIES HDUs of the output file
+        data_hdu: astropy.io.fits.BinTableHDU
+            DATA HDU providing the table header
+        row_ranges: list
+            (data table, first row, last row, time offset) tuples. The time offset in units of the time column
+            is added to the time column of the rows
+        chunk_size: int
+            number of rows copied at a time
+    Returns
+        outfilename: str
+    """
+    if data_hdu.header.get('PCOUNT', 0):
+        raise ValueError('Data tables with variable length arrays are not supported')
+    header = data_hdu.header.copy()
+    header['NAXIS2'] = sum(last - first for _, first, last, _ in row_ranges)
+    for key in ('CHECKSUM', 'DATASUM'):
+        header.remove(key, ignore_missing=True)
+    primary_header.set('FILENAME', outfilename[outfilename.rfind('/') + 1:])
+    fits.HDUList([fits.PrimaryHDU(header=primary_header),
+                  control]).writeto(outfilename, overwrite=True)
+
+    num_bytes = 0
+    with open(outfilename, 'ab') as f:
+        f.write(header.tostring().encode('ascii'))
+        for data, first, last, time_offset in row_ranges:
+            column = data.columns['time']
+            bscale = 1 if column.bscale is None else column.bscale
+            raw = data.view(np.ndarray)
+            if raw.dtype.itemsize != header['NAXIS1']:
+                raise ValueError('Data tables have different row layouts')
+            for i in range(first, last, chunk_size):
+                rows = np.array(raw[i:min(i + chunk_size, last)])
+                if time_offset:
+                    offset = time_offset / bscale
+                    if rows.dtype['time'].kind in 'iu':
+                        offset = np.round(offset)
+                    rows['time'] += offset
+                f.write(rows.tobytes())
+                num_bytes += rows.nbytes
+        f.write(b'\0' * (-num_bytes % 2880))
+    fits.append(outfilename, energy.data, energy.header)
+    return outfilename
+
+
+def spec_fits_concatenate_many(fitsfiles,
+                               tstart=None,
+                               tend=None,
+                               outfilename=None,
+                               factor=1,
+                               chunk_size=4096):
+    """ Concatenate any number of STIX science data product (L1A, L1, or L4) files of the same request type,
+        e.g. all spectrogram requests of a day, into a new FITS file.
+
+        The files are sorted by start time, their energy tables, masks and table layouts are validated once
+        against the first file, and overlapping time bins are resolved using the time bin start times:
+        a time bin is kept only if it starts after the end of the last time bin already kept.
+        Rows are copied chunk by chunk from the memory-mapped input files, so the inputs are not loaded into memory.
+        The time column is shifted to the start time of the new file; no other column is modified.
+
+    Inputs:
+    fitsfiles : list
+        Names of the input FITS files
+
+    tstart : optional, default = None
+        only time bins starting at or after tstart are kept
+
+    tend : optional, default = None
+        only time bins starting before tend are kept
+
+    outfilename : str, default = None
+        Name of output FITS file
+
+    factor : int, default = 1
+        factor by which to convert the time column to seconds, e.g. 100 if it is in units of cs
+
+    chunk_size : int, default = 4096
+        number of rows copied at a time
+
+    Returns:
+        outfilename : str
+        Name of output FITS file"""
+    if not fitsfiles:
+        raise ValueError('No FITS files given')
+    hduls = [fits.open(fname, memmap=True) for fname in fitsfiles]
+    try:
+        edges = [_spec_fits_bin_edges(hdul, factor) for hdul in hduls]
+        order = np.argsort([t0 for t0, _, _ in edges], kind='stable')
+        ref = hduls[order[0]]
+        ref_name = fitsfiles[order[0]]
+        ref_energy = ref[3] if ref[3].name == 'ENERGIES' else ref[4]
+        data_format = [(c.name, c.format) for c in ref[2].columns]
+
+        lo = sdt.utc2unix(tstart) if tstart else -np.inf
+        hi = sdt.utc2unix(tend) if tend else np.inf
+        selected = []
+        last_end = lo
+        for k in order:
+            hdul, fname = hduls[k], fitsfiles[k]
+            energy = hdul[3] if hdul[3].name == 'ENERGIES' else hdul[4]
+            # check that energy tables, masks and table layouts are the same
+            for n in ref_energy.data.names:
+                if not np.allclose(ref_energy.data[n], energy.data[n]):
+                    raise ValueError(
+                        f"Values for {n} in energy table are different in {ref_name} and {fname}!"
+                    )
+            for n in [
+                    'pixel_masks', 'detector_masks', 'pixel_mask',
+                    'detector_mask', 'energy_bin_mask'
+            ]:
+                if n in ref[1].data.names and not np.allclose(
+                        ref[1].data[n], hdul[1].data[n]):
+                    raise ValueError(
+                        f"Values for {n} in control table are different in {ref_name} and {fname}!"
+                    )
+            if [(c.name, c.format) for c in hdul[2].columns] != data_format:
+                raise ValueError(
+                    f"Data tables of {ref_name} and {fname} have different columns!")
+
+            t0, starts, ends = edges[k]
+            first = int(np.searchsorted(starts, last_end, side='left'))
+            last = int(np.searchsorted(starts, hi, side='left'))
+            if last <= first:
+                logger.info(f'No new time bins in {fname}')
+                continue
+            if selected and starts[first] - last_end > hdul[2].data['timedel'][
+                    first] / factor:
+                warnings.warn(
+                    f"Gap of {starts[first] - last_end:.3f}s between spectrogram files before {fname}"
+                )
+            selected.append((k, first, last))
+            last_end = ends[last - 1]
+        if not selected:
+            raise ValueError('No time bins selected')
+
+        k0, first0, _ = selected[0]
+        new_start = edges[k0][1][first0]
+        row_ranges = []
+        for k, first, last in selected:
+            time_offset = (edges[k][0] - new_start) * factor
+            row_ranges.append((hduls[k][2].data, first, last, time_offset))
+
+        primary_header = _set_spec_fits_times(ref[0].header.copy(), new_start,
+                                              last_end)
+        if not outfilename:
+            outfilename = f"{ref_name[:-5]}_{sdt.unix2datetime(new_start):%H%M%S}_{sdt.unix2datetime(last_end):%H%M%S}.fits"
+        return _write_spec_fits(outfilename, primary_header, ref[1].copy(),
+                                ref[2], ref_energy.copy(), row_ranges,
+                                chunk_size)
+    finally:
+        for hdul in hduls:
+            hdul.close()
+
+
+def spec_fits_crop_rows(fitsfile,
+                        tstart=None,
+                        tend=None,
+                        outfilename=None,
+                        factor=1,
+                        chunk_size=4096):
+    """ Crop a STIX science data product (L1A, L1, or L4) to the time bins starting within [tstart, tend).
+        Unlike spec_fits_crop, the input file is memory-mapped and only the rows in the time range are read
+        and copied to the output file, thus the time needed is proportional to the time range, not to the file size.
+        The time column is shifted to the start time of the new file; no other column is modified.
+
+    Inputs:
+    fitsfile : str
+        Name of input FITS file
+
+    tstart : format recognizable by astropy.time.Time (for example, a string), default = None
+        Start time of new FITS file
+
+    tend : format recognizable by astropy.time.Time (for example, a string), default = None
+        End time of new FITS file
+
+    outfilename : str, default = None
+        Name of output FITS file
+
+    factor : int, default = 1
+        factor by which to convert the time column to seconds, e.g. 100 if it is in units of cs
+
+    chunk_size : int, default = 4096
+        number of rows copied at a time
+
+    Returns:
+        outfilename : str
+        Name of output FITS file"""
+    with fits.open(fitsfile, memmap=True) as hdul:
+        t0, starts, ends = _spec_fits_bin_edges(hdul, factor)
+        first = int(np.searchsorted(starts, sdt.utc2unix(tstart),
+                                    side='left')) if tstart else 0
+        last = int(np.searchsorted(starts, sdt.utc2unix(tend),
+                                   side='left')) if tend else len(starts)
+        if last <= first:
+            raise ValueError(
+                f'No time bins between {tstart} and {tend} in {fitsfile}')
+        new_t0, new_end = starts[first], ends[last - 1]
+        energy = hdul[3] if hdul[3].name == 'ENERGIES' else hdul[4]
+        primary_header = _set_spec_fits_times(hdul[0].header.copy(), new_t0,
+                                              new_end)
+        if not outfilename:
+            outfilename = f"{fitsfile[:-5]}_{sdt.unix2datetime(new_t0):%H%M%S}_{sdt.unix2datetime(new_end):%H%M%S}.fits"
+        return _write_spec_fits(outfilename, primary_header, hdul[1].copy(),
+                                hdul[2], energy.copy(),
+                                [(hdul[2].data, first, last,
+                                  (t0 - starts[first]) * factor)], chunk_size)
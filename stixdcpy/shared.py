@@ -0,0 +1,186 @@
+#!/usr/bin/python
+"""
+    Tools to pass large numpy arrays between processes through shared memory
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray(object):
+    """
+        Picklable handle of a numpy array stored in a shared memory block.
+        Only the block name, shape and dtype are pickled; the receiving process
+        attaches the block and gets a zero-copy view of the array
+    """
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._shm = None
+        self._owner_shm = None
+
+    @classmethod
+    def publish(cls, arr):
+        """
+            copy an array to a new shared memory block
+        Args
+            arr: np.ndarray
+        Returns
+            SharedArray handle, owning the block
+        """
+        arr = np.asarray(arr)
+        if not arr.dtype.isnative:
+            arr = arr.astype(arr.dtype.newbyteorder('='))
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        handle = cls(shm.name, arr.shape, arr.dtype)
+        handle._shm = shm
+        handle._owner_shm = shm
+        handle.array[...] = arr
+        return handle
+
+    @property
+    def array(self):
+        """
+            numpy view of the shared memory block, the block is attached on first access.
+            Views hold a buffer export of the block, which keeps it mapped as long as they exist
+        """
+        if self._shm is None:
+            self._shm = _attach(self.name)
+        count = int(np.prod(self.shape))
+        return np.frombuffer(self._shm.buf, dtype=self.dtype,
+                             count=count).reshape(self.shape)
+
+    def close(self):
+        """
+            detach the block from this process. If views of the array are still alive,
+            the block is unmapped later, once they are released
+        """
+        if self._shm is not None:
+            _close(self._shm)
+            self._shm = None
+
+    def unlink(self):
+        """
+            close the block and remove its name, only done by the process which published it.
+            The memory is freed when no process maps it anymore
+        """
+        self.close()
+        if self._owner_shm is not None:
+            self._owner_shm.unlink()
+            self._owner_shm = None
+
+    def __del__(self):
+        # a handle may be dropped before the views of its array, e.g., with an unpickled object
+        self.close()
+
+    def __getstate__(self):
+        return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['shape'], state['dtype'])
+
+    def __repr__(self):
+        return f'SharedArray(name={self.name!r}, shape={self.shape}, dtype={self.dtype})'
+
+
+class SharedArrays(object):
+    """
+        A set of named arrays in shared memory. It is picklable, and can be used as a context manager;
+        the blocks are freed on exit in the publishing process, and detached in other processes
+
+        Example:
+            with SharedArrays.publish(counts=counts) as shared:
+                executor.map(work, [shared] * 4)
+
+            def work(shared):
+                with shared:
+                    return shared['counts'][:, 0].sum()
+    """
+
+    def __init__(self, handles):
+        """
+        Args
+            handles: dict
+                SharedArray handles by name
+        """
+        self.handles = handles
+
+    @classmethod
+    def publish(cls, **arrays):
+        """
+            copy arrays to shared memory blocks
+        Args
+            arrays: np.ndarray
+                arrays by name
+        Returns
+            SharedArrays owning the blocks
+        """
+        handles = {}
+        try:
+            for name, arr in arrays.items():
+                handles[name] = SharedArray.publish(arr)
+        except Exception:
+            for handle in handles.values():
+                handle.unlink()
+            raise
+        return cls(handles)
+
+    def __getitem__(self, name):
+        return self.handles[name].array
+
+    def __contains__(self, name):
+        return name in self.handles
+
+    def keys(self):
+        return self.handles.keys()
+
+    @property
+    def arrays(self):
+        """
+            zero-copy views of all arrays
+        """
+        return {name: handle.array for name, handle in self.handles.items()}
+
+    def close(self):
+        """
+            detach all blocks, and free them if they were published by this process
+        """
+        for handle in self.handles.values():
+            handle.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return f'SharedArrays({list(self.handles.values())})'
+
+
+def _close(shm):
+    """
+        close a shared memory block. If views of it are alive, unmapping it now would leave them
+        pointing to freed memory; the mapping is handed over to the views instead, it is unmapped
+        when the last of them is released
+    """
+    try:
+        shm.close()
+    except BufferError:
+        shm._buf = None
+        shm._mmap = None
+        shm.close()
+
+
+def _attach(name):
+    """
+        attach an existing shared memory block
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13. Child processes share the resource tracker of their parent,
+        # so the block is still only unlinked by the publishing process
+        return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,247 @@
+#!/usr/bin/python
+"""
+    A simple columnar on-disk store for processed science data.
+
+    A store is a folder containing a JSON file with metadata and one or more numpy files per array.
+    Arrays indexed by time are split into chunks of time bins, so that a time range can be read
+    without touching the rest of the data. Uncompressed chunks are memory-mapped when loaded.
+
+    Layout:
+        store/meta.json
+        store/<array>.npy                   arrays not indexed by time
+        store/<array>.<chunk index>.npy     time chunks (or .npz if compressed)
+"""
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from stixdcpy import time_util as sdt
+
+FORMAT_VERSION = 1
+META_FILE = 'meta.json'
+
+
+def _to_json(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+class ArrayStore(object):
+    """
+        Read and write time-chunked numpy arrays with metadata
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / META_FILE) as f:
+            self.info = json.load(f)
+        if self.info.get('format_version') != FORMAT_VERSION:
+            raise ValueError(
+                f'Unsupported store format version: {self.info.get("format_version")}')
+
+    @property
+    def meta(self):
+        return self.info['meta']
+
+    @property
+    def names(self):
+        return list(self.info['arrays'])
+
+    @classmethod
+    def write(cls,
+              path,
+              arrays,
+              meta=None,
+              time_arrays=(),
+              detector_axes=None,
+              chunk_size=256,
+              compress=False,
+              overwrite=False):
+        """
+            Write arrays to a store
+        Args
+            path: str
+                store folder
+            arrays: dict
+                numpy arrays by name, None values are skipped
+            meta: dict
+                JSON serializable metadata
+            time_arrays: list
+                names of the arrays whose first axis is time. They are written in chunks
+            detector_axes: dict
+                detector axis of the arrays, used for reading a subset of detectors
+            chunk_size: int
+                number of time bins per chunk
+            compress: bool
+                compress chunks. Compressed chunks can not be memory-mapped
+            overwrite: bool
+                replace an existing store. Only folders containing a store (i.e., its metadata file)
+                are removed; an existing empty folder is used as it is
+        Returns
+            ArrayStore
+        """
+        path = Path(path)
+        if path.exists() and not (path.is_dir() and not any(path.iterdir())):
+            if not (path / META_FILE).is_file():
+                raise FileExistsError(
+                    f'{path} exists and is not an array store, refusing to overwrite it')
+            if not overwrite:
+                raise FileExistsError(f'{path} already exists')
+            shutil.rmtree(path)
+        path.mkdir(parents=True, exist_ok=True)
+        detector_axes = detector_axes or {}
+        info = {
+            'format_version': FORMAT_VERSION,
+            'meta': meta or {},
+            'chunk_size': int(chunk_size),
+            'compressed': bool(compress),
+            'arrays': {}
+        }
+        for name, arr in arrays.items():
+            if arr is None:
+                continue
+            arr = np.asarray(arr)
+            if not arr.dtype.isnative:
+                arr = arr.astype(arr.dtype.newbyteorder('='))
+            entry = {
+                'shape': list(arr.shape),
+                'dtype': arr.dtype.str,
+                'detector_axis': detector_axes.get(name),
+                'chunked': name in time_arrays and arr.ndim > 0,
+            }
+            if entry['chunked']:
+                num_chunks = max(1, -(-arr.shape[0] // chunk_size))
+                for i in range(num_chunks):
+                    cls._write_array(path / f'{name}.{i}',
+                                     arr[i * chunk_size:(i + 1) * chunk_size],
+                                     compress)
+                entry['num_chunks'] = num_chunks
+            else:
+                cls._write_array(path / name, arr, False)
+            info['arrays'][name] = entry
+        with open(path / META_FILE, 'w') as f:
+            json.dump(info, f, default=_to_json, indent=1)
+        return cls(path)
+
+    @staticmethod
+    def _write_array(fname, arr, compress):
+        if compress:
+            np.savez_compressed(f'{fname}.npz', data=arr)
+        else:
+            np.save(f'{fname}.npy', np.ascontiguousarray(arr))
+
+    def _read_file(self, fname, mmap):
+        npy = self.path / f'{fname}.npy'
+        if npy.is_file():
+            return np.load(npy, mmap_mode='r' if mmap else None)
+        with np.load(self.path / f'{fname}.npz') as data:
+            return data['data']
+
+    def read(self, name, rows=None, detectors=None, mmap=True):
+        """
+            Read an array
+        Args
+            name: str
+                array name
+            rows: tuple or None
+                (start, stop) time bin range, only for time-chunked arrays
+            detectors: slice, list or None
+                detectors to be read, only for arrays with a detector axis
+            mmap: bool
+                memory-map uncompressed files. A single chunk is returned as a memory-mapped view
+        Returns
+            np.ndarray
+        """
+        entry = self.info['arrays'][name]
+        if not entry['chunked']:
+            arr = self._read_file(name, mmap)
+        else:
+            num = entry['shape'][0]
+            start, stop = (0, num) if rows is None else rows
+            start, stop = max(0, start), min(num, stop)
+            size = self.info['chunk_size']
+            if start >= stop:
+                arr = np.empty((0, ) + tuple(entry['shape'][1:]),
+                               dtype=entry['dtype'])
+            else:
+                parts = []
+                for i in range(start // size, (stop - 1) // size + 1):
+                    chunk = self._read_file(f'{name}.{i}', mmap)
+                    offset = i * size
+                    parts.append(chunk[max(start - offset, 0):stop - offset])
+                arr = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        axis = entry['detector_axis']
+        if detectors is not None and axis is not None:
+            index = [slice(None)] * arr.ndim
+            index[axis] = detectors
+            arr = arr[tuple(index)]
+        return arr
+
+
+class ProcessedData(object):
+    """
+        Processed science data loaded from a store.
+        Metadata are available as attributes, arrays are read on first access
+    """
+
+    def __init__(self, path, start_utc=None, end_utc=None, detectors=None,
+                 mmap=True):
+        """
+        Args
+            path: str
+                store folder
+            start_utc, end_utc: str or None
+                only time bins overlapping with this time range are read
+            detectors: slice, list or None
+                only these detectors are read
+            mmap: bool
+                memory-map uncompressed arrays
+        """
+        self.store = ArrayStore(path)
+        self.detectors = detectors
+        self.mmap = mmap
+        self.__dict__.update(self.store.meta)
+        self.rows = None
+        if (start_utc or end_utc) and 'time' in self.store.names:
+            time = self.store.read('time')
+            timedel = self.store.read('timedel')
+            start = sdt.utc2unix(
+                start_utc) - self.T0_unix if start_utc else -np.inf
+            end = sdt.utc2unix(end_utc) - self.T0_unix if end_utc else np.inf
+            self.rows = (int(np.searchsorted(time + 0.5 * timedel, start,
+                                             side='right')),
+                         int(np.searchsorted(time - 0.5 * timedel, end,
+                                             side='left')))
+        self._arrays = {}
+
+    @property
+    def names(self):
+        return self.store.names
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in self.store.names:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'")
+        if name not in self._arrays:
+            self._arrays[name] = self.store.read(name,
+                                                 rows=self.rows,
+                                                 detectors=self.detectors,
+                                                 mmap=self.mmap)
+        return self._arrays[name]
+
+    def __repr__(self):
+        return f'ProcessedData({self.store.path}, arrays={self.names})'
+
+
+def load(path, start_utc=None, end_utc=None, detectors=None, mmap=True):
+    """
+        Load processed data saved by to_store() of science data objects
+    Returns
+        ProcessedData
+    """
+    return ProcessedData(path, start_utc, end_utc, detectors, mmap)
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from astropy.time import Time
 
@@ -24,6 +25,20 @@ def utc2unix(dt):
     return t.timestamp()
     
 
+def utc2unix_array(times):
+    """
+    Convert many UTC times to unix timestamps at once
+    Args:
+        times: array-like
+            UTC strings or datetime objects, of any shape
+    Returns:
+        numpy float64 array of the same shape
+    """
+    values = np.asarray(times, dtype=object)
+    stamps = [pd.to_datetime(t, utc=True).timestamp() for t in values.ravel()]
+    return np.array(stamps, dtype=np.float64).reshape(values.shape)
+
+
 def utc2datetime(t):
     return pd.to_datetime(t, utc=True).to_pydatetime()
 
@@ -38,3 +53,27 @@ def unix2utc(ts):
 
 def unix2datetime(unix_timestamp):
     return datetime.utcfromtimestamp(unix_timestamp)
+
+
+def unix2datetime64(unix_timestamps):
+    """
+    Convert unix timestamps to numpy datetime64[ns] in one vectorized step
+    Args:
+        unix_timestamps: float or array-like
+            seconds since 1970-01-01
+    Returns:
+        numpy datetime64[ns] array
+    """
+    ts = np.asarray(unix_timestamps, dtype=np.float64)
+    # split into whole seconds and nanoseconds to keep ns precision
+    seconds = np.floor(ts)
+    nanoseconds = np.round((ts - seconds) * 1e9).astype(np.int64)
+    return (seconds.astype(np.int64).astype('datetime64[s]') +
+            nanoseconds.astype('timedelta64[ns]'))
+
+
+def datetime64_to_datetime(dt64):
+    """
+    Convert a datetime64 array to a list of python datetime objects
+    """
+    return np.asarray(dt64).astype('datetime64[us]').tolist()
@@ -387,6 +387,21 @@ class Transmission:
         #calculate mean energy transmission factors for energy bins
         return mean_trans
 
+    def get_attenuator_transmission(self, energy_bins):
+        '''
+            get transmission of the attenuator alone, i.e., the factor by which inserting the attenuator
+            reduces the counts
+            Arguments
+            ---------
+            energy_bins:   N x 2 array like [[e_bin_0_low, ebin_0_up], ...[]]
+            Returns
+            --------
+            mean transmission in the energy bins
+        '''
+        ebins_1d = np.asarray(energy_bins, dtype=float).reshape(-1) * u.keV
+        trans = Compound([self.components['attenuator']]).transmission(ebins_1d)
+        return np.mean(np.asarray(trans).reshape((-1, 2)), axis=1)
+
     def get_transmission_of_component(self, component_name: str,
                                       energies_keV: np.array):
         """
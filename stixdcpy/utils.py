@@ -2,6 +2,7 @@
     This module provides APIs to retrieve STIX preview images from STIX data center , and provides tools to display the data
     """
 import sys
+import hashlib
 
 def is_notebook():
     """
@@ -10,3 +11,44 @@ def is_notebook():
     """
     return 'ipykernel' in sys.modules
 
+
+def file_checksum(filename, chunk_size=1 << 20):
+    """
+    Compute the md5 checksum of the content of a file
+    Args:
+        filename: str
+            file name
+        chunk_size: int
+            number of bytes read at a time
+    Returns:
+        md5 hex digest
+    """
+    md5 = hashlib.md5()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def fits_checksum(filename, hdul=None):
+    """
+    Checksum of a FITS file, derived from the CHECKSUM keywords of its HDUs if they are available,
+    so that the data do not need to be read. Otherwise the md5 checksum of the file content
+    Args:
+        filename: str
+            FITS filename
+        hdul: astropy.io.fits.HDUList or None
+            the opened file, it is opened (only headers are read) if not given
+    Returns:
+        hex digest
+    """
+    if hdul is None:
+        from astropy.io import fits
+        with fits.open(filename, memmap=True) as f:
+            sums = [hdu.header.get('CHECKSUM') for hdu in f]
+    else:
+        sums = [hdu.header.get('CHECKSUM') for hdu in hdul]
+    if all(sums):
+        return hashlib.md5(''.join(sums).encode('utf-8')).hexdigest()
+    return file_checksum(filename)
+
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+from stixdcpy import integer_compression as sic
+
+SKM = (0, 5, 3)
+
+
+def make_l1_pixel_data(fname,
+                       num_times=40,
+                       t0='2023-05-01T10:00:00.000',
+                       seed=0,
+                       extra_columns=None):
+    """
+        Write a small synthetic L1 pixel data file. Counts and triggers are unsigned columns
+        stored with TZERO, as in STIX L1 files, and counts are valid compressed values.
+        extra_columns are added to the DATA table
+    """
+    rng = np.random.default_rng(seed)
+    primary = fits.PrimaryHDU()
+    for key in ('DATE-BEG', 'DATE_BEG', 'DATE_END'):
+        primary.header[key] = t0
+    primary.header['EAR_TDEL'] = 300.0
+    primary.header['SUN_TIME'] = 400.0
+    primary.header['FILENAME'] = str(fname).split('/')[-1]
+
+    energy_bin_mask = np.zeros(32, dtype=np.int32)
+    energy_bin_mask[1:30] = 1
+    control = Table({
+        'request_id': [1234],
+        'energy_bin_mask': [energy_bin_mask],
+        'compression_scheme_counts_skm': [np.array(SKM)],
+        'detector_masks': [np.ones(32, dtype=np.int32)],
+        'pixel_masks': [np.ones(12, dtype=np.int32)]
+    })
+
+    lut_values = sic.Compression(*SKM).lut_values[:64]
+    counts = rng.choice(lut_values, size=(num_times, 32, 12, 32)).astype(np.uint32)
+    triggers = rng.poisson(2000, size=(num_times, 16)).astype(np.uint32)
+    timedel = np.full(num_times, 4.0, dtype=np.float32)
+    timedel[num_times // 2:] = 2.0
+    time = np.cumsum(timedel) - timedel / 2
+    rcr = np.zeros(num_times, dtype=np.uint8)
+    rcr[num_times // 4:num_times // 2] = 1
+    data = Table({
+        'counts': counts,
+        'counts_comp_err': np.sqrt(counts).astype(np.float32),
+        'triggers': triggers,
+        'triggers_comp_err': np.sqrt(triggers).astype(np.float32),
+        'rcr': rcr,
+        'timedel': timedel,
+        'time': time.astype(np.float64)
+    })
+    for name, values in (extra_columns or {}).items():
+        data[name] = values
+
+    e_low = np.array([
+        0, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 18, 20, 22, 25, 28, 32, 36,
+        40, 45, 50, 56, 63, 70, 76, 84, 100, 120, 150
+    ], dtype=float)
+    energies = Table({
+        'channel': np.arange(32),
+        'e_low': e_low,
+        'e_high': np.append(e_low[1:], 160.)
+    })
+    fits.HDUList([
+        primary,
+        fits.BinTableHDU(control, name='CONTROL'),
+        fits.BinTableHDU(data, name='DATA'),
+        fits.BinTableHDU(energies, name='ENERGIES')
+    ]).writeto(fname, overwrite=True)
+    return str(fname)
+
+
+@pytest.fixture
+def l1_file(tmp_path):
+    return make_l1_pixel_data(tmp_path / 'l1_pixel_data.fits')
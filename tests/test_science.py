@@ -0,0 +1,96 @@
+import pickle
+
+import numpy as np
+from astropy.io import fits
+
+from stixdcpy.science import PixelData, spec_fits_concatenate_many, spec_fits_crop_rows
+
+from conftest import make_l1_pixel_data
+
+
+def test_release_shared_memory_drops_aliases(l1_file):
+    pd = PixelData(l1_file, None)
+    pd.compute_errors_from_counts()
+    handle = pd.share_memory('pixel_counts_comp_stat_err')['pixel_counts_comp_stat_err']
+    with pd.share_cubes():
+        # pixel_counts_error is cached as the shared view here
+        assert np.shares_memory(pd.pixel_counts_error, handle.array)
+    block = handle.array
+    pd.release_shared_memory()
+    assert pd._shared == {}
+    assert not np.shares_memory(pd.pixel_counts_error, block)
+    assert not np.shares_memory(pd.pixel_counts_comp_stat_err, block)
+    np.testing.assert_array_equal(pd.pixel_counts_error, block)
+    corrected = pd.correct_dead_time()
+    assert np.all(np.isfinite(corrected['corrected_counts_err']))
+
+
+def test_share_memory_round_trip(l1_file):
+    pd = PixelData(l1_file, None)
+    spectrogram = np.array(pd.spectrogram)
+    handles = pd.share_memory('spectrogram', 'counts')
+    assert set(handles) == {'spectrogram', 'counts'}
+    assert np.shares_memory(pd.spectrogram, handles['spectrogram'].array)
+    # the unpickled copy attaches the same blocks in its own mapping
+    copy = pickle.loads(pickle.dumps(pd))
+    np.testing.assert_array_equal(copy.counts, pd.counts)
+    copy.spectrogram[0, 0] += 1
+    assert pd.spectrogram[0, 0] == spectrogram[0, 0] + 1
+    copy.spectrogram[0, 0] -= 1
+    del copy
+    pd.release_shared_memory()
+    assert pd._shared == {}
+    np.testing.assert_array_equal(pd.spectrogram, spectrogram)
+    np.testing.assert_array_equal(pd.counts, pd.read_column('counts'))
+
+
+def test_read_column_keeps_unsigned_dtype(tmp_path):
+    num_times = 40
+    large = np.full(num_times, 2**15 + 7, dtype=np.uint16)
+    large[::3] = 2**16 - 1
+    fname = make_l1_pixel_data(tmp_path / 'l1.fits',
+                               num_times,
+                               extra_columns={'large': large})
+    pd = PixelData(fname, None)
+    with fits.open(fname) as hdul:
+        data = hdul['DATA'].data
+        for name in ('counts', 'triggers'):
+            column = pd.read_column(name)
+            expected = data[name][pd._row_range[0]:pd._row_range[1]]
+            assert column.dtype == np.uint32
+            assert column.dtype.isnative
+            np.testing.assert_array_equal(column, expected)
+        column = pd.read_column('large', shifted=False, rows=(3, 9))
+        assert column.dtype == np.uint16
+        np.testing.assert_array_equal(column, large[3:9])
+    assert pd.counts.dtype == np.uint32
+
+
+def test_iter_chunks_reads_counts_per_chunk(l1_file):
+    full = PixelData(l1_file, None)
+    lazy = PixelData(l1_file, None, columns=['rcr'])
+    assert lazy.pixel_counts is None and lazy.triggers is None
+    chunks = list(lazy.iter_chunks(chunk_size=7))
+    assert [c['rows'] for c in chunks][:2] == [(0, 7), (7, 14)]
+    corrected = full.correct_dead_time()
+    for name in ('counts', 'corrected_counts', 'corrected_counts_err'):
+        np.testing.assert_allclose(np.concatenate([c[name] for c in chunks]),
+                                   full.pixel_counts if name == 'counts' else
+                                   corrected[name])
+    sums = lazy.reduce_in_chunks(chunk_size=5, dead_time_correction=False)
+    np.testing.assert_allclose(sums['spectrum'], full.spectrum)
+
+
+def test_crop_and_concatenate_keep_microsecond_start_time(tmp_path):
+    t0 = '2023-05-01T10:00:00.123456'
+    first = make_l1_pixel_data(tmp_path / 'first.fits', t0=t0)
+    second = make_l1_pixel_data(tmp_path / 'second.fits',
+                                t0='2023-05-01T10:02:00.123456',
+                                seed=1)
+    cropped = spec_fits_crop_rows(first, outfilename=str(tmp_path / 'cropped.fits'))
+    merged = spec_fits_concatenate_many([first, second],
+                                        outfilename=str(tmp_path / 'merged.fits'))
+    for fname in (cropped, merged):
+        header = fits.getheader(fname)
+        assert header['DATE-BEG'] == t0
+        assert header['DATE_BEG'] == t0
@@ -0,0 +1,63 @@
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+
+from stixdcpy.shared import SharedArray, SharedArrays
+
+
+def test_publish_round_trip():
+    arr = np.arange(24, dtype='>i4').reshape(2, 3, 4)
+    handle = SharedArray.publish(arr)
+    try:
+        assert handle.array.dtype.isnative
+        np.testing.assert_array_equal(handle.array, arr)
+        attached = pickle.loads(pickle.dumps(handle))
+        np.testing.assert_array_equal(attached.array, arr)
+        attached.close()
+    finally:
+        handle.unlink()
+
+
+def test_views_outlive_unlink():
+    # reading views of an unlinked block used to crash the interpreter, hence the subprocess
+    code = ('import numpy as np\n'
+            'from stixdcpy.shared import SharedArray\n'
+            'h = SharedArray.publish(np.arange(1e6))\n'
+            'v = h.array\n'
+            'w = v[10:]\n'
+            'h.unlink()\n'
+            'print(v[-1] + w[0])\n')
+    result = subprocess.run([sys.executable, '-c', code],
+                            capture_output=True,
+                            text=True)
+    assert result.returncode == 0, result.stderr
+    assert float(result.stdout) == 999999 + 10
+
+
+def test_views_outlive_attached_handle():
+    code = ('import gc, pickle\n'
+            'import numpy as np\n'
+            'from stixdcpy.shared import SharedArray\n'
+            'h = SharedArray.publish(np.arange(10.))\n'
+            'attached = pickle.loads(pickle.dumps(h))\n'
+            'v = attached.array\n'
+            'del attached\n'
+            'gc.collect()\n'
+            'print(v.sum())\n'
+            'del v\n'
+            'h.unlink()\n')
+    result = subprocess.run([sys.executable, '-c', code],
+                            capture_output=True,
+                            text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'BufferError' not in result.stderr
+    assert float(result.stdout) == 45
+
+
+def test_shared_arrays_context():
+    with SharedArrays.publish(a=np.ones(3), b=np.zeros((2, 2))) as shared:
+        assert set(shared.keys()) == {'a', 'b'}
+        view = shared['a']
+    assert view.sum() == 3
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from stixdcpy import store as sst
+from stixdcpy import time_util as sdt
+from stixdcpy.science import PixelData
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_array_store_range_reads(tmp_path, compress):
+    arr = np.arange(512 * 3, dtype=np.float32).reshape(512, 3)
+    st = sst.ArrayStore.write(tmp_path / 'store', {'a': arr},
+                              time_arrays=['a'],
+                              chunk_size=256,
+                              compress=compress)
+    for rows in [(0, 512), (10, 300), (255, 257), (256, 512), (511, 600),
+                 (-5, 3)]:
+        np.testing.assert_array_equal(st.read('a', rows=rows),
+                                      arr[max(rows[0], 0):rows[1]])
+    for rows in [(512, 512), (600, 700), (300, 200)]:
+        empty = st.read('a', rows=rows)
+        assert empty.shape == (0, 3) and empty.dtype == arr.dtype
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_pixel_data_store_range_reads(tmp_path, l1_file, compress):
+    pd = PixelData(l1_file, None)
+    st = pd.to_store(tmp_path / 'store', chunk_size=8, compress=compress)
+    for rows in [(0, 40), (5, 19), (8, 16), (30, 45)]:
+        counts = st.read('counts', rows=rows)
+        assert counts.dtype == np.uint32
+        np.testing.assert_array_equal(counts, pd.counts[rows[0]:rows[1]])
+        np.testing.assert_array_equal(st.read('time', rows=rows),
+                                      pd.time[rows[0]:rows[1]])
+
+
+def test_write_refuses_foreign_folders(tmp_path):
+    folder = tmp_path / 'folder'
+    folder.mkdir()
+    (folder / 'important.txt').write_text('keep')
+    with pytest.raises(FileExistsError):
+        sst.ArrayStore.write(folder, {'a': np.zeros(3)}, overwrite=True)
+    assert (folder / 'important.txt').read_text() == 'keep'
+
+
+def test_processed_data_after_last_bin(tmp_path, l1_file):
+    pd = PixelData(l1_file, None)
+    pd.to_store(tmp_path / 'store', chunk_size=8)
+    after_end = pd.T0_unix + pd.time[-1] + 100
+    loaded = sst.load(tmp_path / 'store', start_utc=sdt.unix2utc(after_end))
+    assert loaded.counts.shape == (0, ) + pd.counts.shape[1:]
+    loaded = sst.load(tmp_path / 'store')
+    np.testing.assert_array_equal(loaded.counts, pd.counts)